@@ -1,17 +1,60 @@
 import asyncio
 import logging
-import logging.config
 from aiogram import Bot, Dispatcher, types
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
 import os
-import sys
 from dotenv import load_dotenv
 
 from app.db.config import (
+    BOT_MODE,
+    BROADCAST_BATCH_SIZE,
+    CLEANUP_INTERVAL,
+    RECONCILE_INTERVAL,
+    SEND_CHAT_LIMIT,
+    SEND_GLOBAL_RATE,
+    SEND_MAX_RETRIES,
+    STATS_LOG_INTERVAL,
+    STATS_SYNC_INTERVAL,
+    THROTTLE_ADDCON,
+    THROTTLE_ADDCON_GLOBAL,
+    THROTTLE_CHAT,
+    THROTTLE_CONNSTAT,
+    THROTTLE_CONNSTAT_GLOBAL,
+    THROTTLE_GLOBAL,
+    TRAFFIC_ROLLUP_INTERVAL,
+    UPDATE_QUEUE_LIMIT,
+    UPDATE_WORKERS,
+    WEBHOOK_HOST,
+    WEBHOOK_PATH,
+    WEBHOOK_PORT,
+    WEBHOOK_SECRET,
+    WEBHOOK_URL,
+    get_read_session_maker,
     get_session_maker,
 )
-from app.dependencies.logging_settings import logging_config
+from app.db.user_cache import user_cache
+from app.dependencies.logging_settings import setup_logging
+from app.jobs.broadcast import Broadcaster
+from app.jobs.cleanup import run_cleanup
+from app.jobs.expiry import ExpiryScheduler
+from app.jobs.periodic import run_periodically
+from app.jobs.reconcile import run_reconcile
+from app.jobs.stats_sync import sync_client_stats
+from app.jobs.traffic_rollup import rollup_traffic
+from app.login_client import get_async_client
+from app.middlewares.api import ApiClientMiddleware
 from app.middlewares.database import DataBaseSession, UserMiddleware
+from app.middlewares.ordering import ChatOrderingMiddleware
+from app.middlewares.send_scheduler import SendScheduler
+from app.middlewares.throttling import Limit, ThrottlingMiddleware
 from app.handlers import user_router, admin_router
+from app.kbds.menu_markups import (
+    AdminAction,
+    AdminActionData,
+    UserAction,
+    UserActionData,
+)
 
 load_dotenv(dotenv_path="token.env")
 BOT_TOKEN: str = os.getenv("SECRET_KEY") or ""
@@ -21,25 +64,125 @@ if not BOT_TOKEN:
 
 ALLOWED_UPDATES = ["message", "edited_message", "callback_query"]
 
-logging.config.dictConfig(logging_config)
+setup_logging()
 logger = logging.getLogger(__name__)
 
-# Set SQLAlchemy engine logger to use the same formatter and level as the main project
-sqlalchemy_logger = logging.getLogger("sqlalchemy.engine")
-sqlalchemy_logger.setLevel(logging.INFO)
-sqlalchemy_logger.handlers = [logging.StreamHandler(sys.stdout)]
-sqlalchemy_logger.propagate = False
-
 bot = Bot(token=BOT_TOKEN)
+# Все send*/edit* бота идут через общую очередь с лимитами Bot API.
+send_scheduler = SendScheduler(
+    SEND_GLOBAL_RATE, Limit(*SEND_CHAT_LIMIT), max_retries=SEND_MAX_RETRIES
+)
+bot.session.middleware(send_scheduler)
 dp = Dispatcher()
 dp.include_router(user_router)
 dp.include_router(admin_router)
 
+# Один клиент панели на весь процесс: пул соединений и логин переиспользуются.
+api_client = get_async_client()
+# Хендлеры получают планировщик как аргумент expiry_scheduler.
+expiry_scheduler = ExpiryScheduler(
+    get_session_maker(), bot, read_session_maker=get_read_session_maker()
+)
+dp["expiry_scheduler"] = expiry_scheduler
+broadcaster = Broadcaster(
+    get_session_maker(),
+    bot,
+    read_session_maker=get_read_session_maker(),
+    batch_size=BROADCAST_BATCH_SIZE,
+)
+dp["broadcaster"] = broadcaster
+db_session_middleware = DataBaseSession(session_maker=get_session_maker())
+ordering_middleware = ChatOrderingMiddleware(workers=UPDATE_WORKERS)
+throttling_middleware = ThrottlingMiddleware(
+    chat_limit=Limit(*THROTTLE_CHAT),
+    global_limit=Limit(*THROTTLE_GLOBAL),
+    action_limits={
+        # addClient и полный снимок inbound в add_connection.
+        f"{UserActionData.__prefix__}:{UserAction.addcon.value}": (
+            Limit(*THROTTLE_ADDCON),
+            Limit(*THROTTLE_ADDCON_GLOBAL),
+        ),
+        f"{AdminActionData.__prefix__}:{AdminAction.connstat.value}": (
+            Limit(*THROTTLE_CONNSTAT),
+            Limit(*THROTTLE_CONNSTAT_GLOBAL),
+        ),
+    },
+)
+background_tasks: set[asyncio.Task] = set()
+
+
+def track_background(task: asyncio.Task) -> None:
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+
+
+def start_background(job, interval: float, name: str) -> None:
+    if interval <= 0:
+        logger.info("Фоновая задача %s отключена", name)
+        return
+    track_background(
+        asyncio.create_task(run_periodically(job, interval, name), name=name)
+    )
+
+
+async def log_stats() -> None:
+    logger.info("Кэш пользователей: %s", user_cache.stats())
+    logger.info("Сессии БД: %s", db_session_middleware.stats())
+    logger.info("Обработка апдейтов: %s", ordering_middleware.stats())
+    logger.info("Троттлинг: %s", throttling_middleware.stats())
+    logger.info("Очередь отправки: %s", send_scheduler.stats())
+
+
+async def on_startup() -> None:
+    track_background(asyncio.create_task(expiry_scheduler.run(), name="expiry"))
+    # Продолжает рассылки, прерванные перезапуском.
+    track_background(asyncio.create_task(broadcaster.run(), name="broadcast"))
+    start_background(
+        lambda: run_cleanup(get_session_maker(), api_client),
+        CLEANUP_INTERVAL,
+        "cleanup",
+    )
+    start_background(
+        lambda: run_reconcile(
+            get_session_maker(),
+            api_client,
+            read_session_maker=get_read_session_maker(),
+            expiry_scheduler=expiry_scheduler,
+        ),
+        RECONCILE_INTERVAL,
+        "reconcile",
+    )
+    start_background(
+        lambda: sync_client_stats(get_session_maker(), api_client),
+        STATS_SYNC_INTERVAL,
+        "stats_sync",
+    )
+    start_background(
+        lambda: rollup_traffic(get_session_maker()),
+        TRAFFIC_ROLLUP_INTERVAL,
+        "traffic_rollup",
+    )
+    start_background(log_stats, STATS_LOG_INTERVAL, "stats_log")
+
+
+async def on_shutdown() -> None:
+    for task in list(background_tasks):
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await api_client.close()
+    await log_stats()
+    await send_scheduler.close()
+
 
 async def main() -> None:
-    dp.update.middleware(DataBaseSession(session_maker=get_session_maker()))
+    # Троттлинг до очереди чата: отклонённый апдейт не ждёт лок и слот.
+    dp.update.outer_middleware(throttling_middleware)
+    dp.update.outer_middleware(ordering_middleware)
+    dp.update.middleware(db_session_middleware)
     dp.update.middleware(UserMiddleware())
-    await bot.delete_webhook(drop_pending_updates=True)
+    dp.update.middleware(ApiClientMiddleware(api_client))
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     # await bot.delete_my_commands(scope=types.BotCommandScopeAllPrivateChats())
     await bot.set_my_commands(
         commands=[
@@ -47,7 +190,47 @@ async def main() -> None:
         ],
         scope=types.BotCommandScopeAllPrivateChats(),
     )
-    await dp.start_polling(bot, allowed_updates=ALLOWED_UPDATES)
+    if BOT_MODE == "webhook":
+        await run_webhook()
+    else:
+        await bot.delete_webhook(drop_pending_updates=True)
+        await dp.start_polling(
+            bot,
+            allowed_updates=ALLOWED_UPDATES,
+            tasks_concurrency_limit=UPDATE_QUEUE_LIMIT,
+        )
+
+
+async def run_webhook() -> None:
+    """
+    Принимает апдейты через aiohttp: Telegram присылает их POST-запросом,
+    запрос с неверным секретом отклоняется (401). Ответ отправляется после
+    обработки, поэтому max_connections ограничивает число апдейтов в работе.
+    """
+    if not WEBHOOK_URL or not WEBHOOK_SECRET:
+        raise ValueError("Missing WEBHOOK_URL or WEBHOOK_SECRET")
+    app = web.Application()
+    SimpleRequestHandler(
+        dp, bot, handle_in_background=False, secret_token=WEBHOOK_SECRET
+    ).register(app, path=WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT).start()
+        await bot.set_webhook(
+            WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=ALLOWED_UPDATES,
+            drop_pending_updates=True,
+            # Telegram допускает от 1 до 100 одновременных соединений.
+            max_connections=min(UPDATE_QUEUE_LIMIT, 100),
+        )
+        logger.info("Webhook listening on %s:%s", WEBHOOK_HOST, WEBHOOK_PORT)
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
 
 
 if __name__ == "__main__":
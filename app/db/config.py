@@ -7,15 +7,58 @@ from sqlalchemy.ext.asyncio import (
     async_sessionmaker,
     create_async_engine,
 )
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 
-def get_engine(db_path: str = "database.db") -> AsyncEngine:
-    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}", echo=True)
+load_dotenv(dotenv_path="token.env")
+
+# Update processing: handlers running at once across chats, and updates
+# admitted (running or queued behind their chat) before polling pauses.
+UPDATE_WORKERS: int = int(os.getenv("UPDATE_WORKERS") or "16")
+UPDATE_QUEUE_LIMIT: int = int(os.getenv("UPDATE_QUEUE_LIMIT") or "100")
+
+# SQLite engine profile. DB_ECHO sets the sqlalchemy.engine logger to INFO
+# (see logging_settings) to log every statement.
+DB_ECHO: bool = (os.getenv("DB_ECHO") or "false").lower() in ("1", "true", "yes")
+# WAL lets readers run while a write is in progress; NORMAL is durable enough with WAL.
+SQLITE_JOURNAL_MODE: str = os.getenv("SQLITE_JOURNAL_MODE") or "WAL"
+SQLITE_SYNCHRONOUS: str = os.getenv("SQLITE_SYNCHRONOUS") or "NORMAL"
+SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE") or "268435456")
+# Negative cache_size is in KiB: 64 MiB of page cache per connection.
+SQLITE_CACHE_SIZE: int = int(os.getenv("SQLITE_CACHE_SIZE") or "-65536")
+SQLITE_BUSY_TIMEOUT: int = int(os.getenv("SQLITE_BUSY_TIMEOUT") or "5000")
+# Every aiosqlite connection owns a thread, so the pool never overflows. An
+# update holds its write connection until the unit of work commits, so the
+# write pool must cover UPDATE_WORKERS plus the background jobs; otherwise
+# updates wait pool_timeout (30 s) for a connection and fail.
+DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE") or str(UPDATE_WORKERS + 4))
+DB_READ_POOL_SIZE: int = int(os.getenv("DB_READ_POOL_SIZE") or "5")
+
+
+def get_engine(db_path: str = "database.db", read_only: bool = False) -> AsyncEngine:
+    if read_only:
+        url = f"sqlite+aiosqlite:///file:{db_path}?mode=ro&uri=true"
+    else:
+        url = f"sqlite+aiosqlite:///{db_path}"
+    engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=DB_READ_POOL_SIZE if read_only else DB_POOL_SIZE,
+        max_overflow=0,
+    )
 
     @event.listens_for(engine.sync_engine, "connect")
     def set_sqlite_pragma(dbapi_connection, connection_record):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+        else:
+            cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+            cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
         cursor.close()
 
     return engine
@@ -24,16 +67,103 @@ def get_engine(db_path: str = "database.db") -> AsyncEngine:
 session_maker = async_sessionmaker(
     bind=get_engine(), class_=AsyncSession, expire_on_commit=False
 )
+# Read-only connections for reporting queries and background scans.
+read_session_maker = async_sessionmaker(
+    bind=get_engine(read_only=True), class_=AsyncSession, expire_on_commit=False
+)
 
 
 def get_session_maker() -> async_sessionmaker[AsyncSession]:
     return session_maker
 
 
-load_dotenv(dotenv_path="token.env")
+def get_read_session_maker() -> async_sessionmaker[AsyncSession]:
+    return read_session_maker
 
 
 VPN_USERNAME: str = os.getenv("VPN_USERNAME") or ""
 VPN_PASSWORD: str = os.getenv("VPN_PASSWORD") or ""
 DEFAULT_INBOUND: str = os.getenv("DEFAULT_INBOUND") or "1"
 BASE_URL: str = os.getenv("BASE_URL") or ""
+
+# Pool settings for the shared panel HTTP client.
+PANEL_POOL_SIZE: int = int(os.getenv("PANEL_POOL_SIZE") or "20")
+PANEL_KEEPALIVE_TIMEOUT: float = float(os.getenv("PANEL_KEEPALIVE_TIMEOUT") or "30")
+PANEL_REQUEST_TIMEOUT: float = float(os.getenv("PANEL_REQUEST_TIMEOUT") or "30")
+# Clients per addClient request in APIClient.add_connections_bulk().
+PANEL_BULK_CHUNK_SIZE: int = int(os.getenv("PANEL_BULK_CHUNK_SIZE") or "100")
+# How long (seconds) a fetched inbound snapshot is reused; 0 disables the cache.
+INBOUND_CACHE_TTL: float = float(os.getenv("INBOUND_CACHE_TTL") or "10")
+# "lazy" parses clients on access, "validated" runs full pydantic validation.
+INBOUND_PARSE_MODE: str = os.getenv("INBOUND_PARSE_MODE") or "lazy"
+# Read inbounds/list incrementally and keep only the configured inbound.
+INBOUND_STREAMING: bool = (os.getenv("INBOUND_STREAMING") or "false").lower() in (
+    "1",
+    "true",
+    "yes",
+)
+
+# Cleanup of expired/orphaned panel clients; interval 0 disables the job.
+CLEANUP_INTERVAL: float = float(os.getenv("CLEANUP_INTERVAL") or "3600")
+CLEANUP_BATCH_SIZE: int = int(os.getenv("CLEANUP_BATCH_SIZE") or "500")
+CLEANUP_CONCURRENCY: int = int(os.getenv("CLEANUP_CONCURRENCY") or "8")
+
+# Background sync of panel traffic counters into client_stats; 0 disables it.
+STATS_SYNC_INTERVAL: float = float(os.getenv("STATS_SYNC_INTERVAL") or "60")
+
+# Traffic history rollups (seconds): raw deltas -> hourly -> daily -> dropped.
+TRAFFIC_ROLLUP_INTERVAL: float = float(os.getenv("TRAFFIC_ROLLUP_INTERVAL") or "3600")
+TRAFFIC_RAW_RETENTION: int = int(os.getenv("TRAFFIC_RAW_RETENTION") or "10800")
+TRAFFIC_HOURLY_RETENTION: int = int(os.getenv("TRAFFIC_HOURLY_RETENTION") or "604800")
+TRAFFIC_DAILY_RETENTION: int = int(os.getenv("TRAFFIC_DAILY_RETENTION") or "31536000")
+
+# Reconciliation of Connection flags against the panel; interval 0 disables the job.
+RECONCILE_INTERVAL: float = float(os.getenv("RECONCILE_INTERVAL") or "900")
+
+# Periodic logging of cache, middleware and send queue stats; 0 disables it.
+STATS_LOG_INTERVAL: float = float(os.getenv("STATS_LOG_INTERVAL") or "300")
+
+# chat_id -> User cache in UserMiddleware; size or ttl 0 disables it.
+USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE") or "10000")
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL") or "60")
+
+# Telegram update delivery: "polling" or "webhook". In webhook mode an aiohttp
+# server listens on WEBHOOK_HOST:WEBHOOK_PORT and Telegram posts updates to
+# WEBHOOK_URL + WEBHOOK_PATH with WEBHOOK_SECRET in the secret token header.
+BOT_MODE: str = (os.getenv("BOT_MODE") or "polling").lower()
+WEBHOOK_URL: str = os.getenv("WEBHOOK_URL") or ""
+WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH") or "/webhook"
+WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET") or ""
+WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST") or "0.0.0.0"
+WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT") or "8080")
+
+
+def _rate_limit(name: str, default: str) -> tuple[float, float]:
+    """
+    "rate/burst" from the environment: tokens per second and bucket size.
+    """
+    rate, burst = (os.getenv(name) or default).split("/")
+    return float(rate), float(burst)
+
+
+# Token-bucket throttling of updates, per chat and global. Expensive actions
+# (adding a connection, admin connection stats) have their own buckets on top.
+THROTTLE_CHAT = _rate_limit("THROTTLE_CHAT", "2/10")
+THROTTLE_GLOBAL = _rate_limit("THROTTLE_GLOBAL", "50/200")
+THROTTLE_ADDCON = _rate_limit("THROTTLE_ADDCON", "0.05/3")
+THROTTLE_ADDCON_GLOBAL = _rate_limit("THROTTLE_ADDCON_GLOBAL", "2/10")
+THROTTLE_CONNSTAT = _rate_limit("THROTTLE_CONNSTAT", "0.5/5")
+THROTTLE_CONNSTAT_GLOBAL = _rate_limit("THROTTLE_CONNSTAT_GLOBAL", "5/20")
+
+# Outgoing messages: Bot API allows about 30 per second overall and one per
+# second per chat with short bursts; 429 retries per message before giving up.
+SEND_GLOBAL_RATE: float = float(os.getenv("SEND_GLOBAL_RATE") or "30")
+SEND_CHAT_LIMIT = _rate_limit("SEND_CHAT_LIMIT", "1/3")
+SEND_MAX_RETRIES: int = int(os.getenv("SEND_MAX_RETRIES") or "3")
+
+# Admin broadcast: users per batch read from the DB and sent before the
+# progress is checkpointed (a restart may resend at most one batch).
+BROADCAST_BATCH_SIZE: int = int(os.getenv("BROADCAST_BATCH_SIZE") or "100")
+
+# Rows per page in admin lists (Telegram allows at most 100 inline buttons).
+ADMIN_PAGE_SIZE: int = int(os.getenv("ADMIN_PAGE_SIZE") or "20")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import ForeignKey, String, false
+from sqlalchemy import BigInteger, ForeignKey, Index, String, UniqueConstraint, false
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
 
@@ -12,7 +12,7 @@ class User(Base):
     username: Mapped[str] = mapped_column(String(50), nullable=False)
     admin: Mapped[bool] = mapped_column(default=False, server_default=false())
     first_name: Mapped[str] = mapped_column(String(100), nullable=False)
-    chat_id: Mapped[int] = mapped_column(nullable=False)
+    chat_id: Mapped[int] = mapped_column(nullable=False, unique=True, index=True)
 
     # One-to-many relationship: one user can have many connections.
     connections: Mapped[list["Connection"]] = relationship(
@@ -25,12 +25,16 @@ class User(Base):
 
 class Connection(Base):
     __tablename__ = "connections"
+    # (user_id, exists_in_api) also serves plain user_id lookups.
+    __table_args__ = (
+        Index("ix_connections_user_id_exists_in_api", "user_id", "exists_in_api"),
+    )
     inbound: Mapped[int] = mapped_column(nullable=False)
-    email: Mapped[str] = mapped_column(String(100), nullable=False)
+    email: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     connection_url: Mapped[str] = mapped_column(String(100), nullable=False)
     created_at: Mapped[datetime] = mapped_column(nullable=False)
     expired_at: Mapped[datetime] = mapped_column(nullable=False)
-    uuid: Mapped[str] = mapped_column(String(100), nullable=False)
+    uuid: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     exists_in_api: Mapped[bool] = mapped_column(default=True)
     enabled: Mapped[bool] = mapped_column(default=True)
     total_gb: Mapped[float] = mapped_column(default=0.0)
@@ -44,3 +48,62 @@ class Connection(Base):
 
     def __repr__(self) -> str:
         return f"<Connection(id={self.id}, email={self.email})>"
+
+
+class ClientStat(Base):
+    """Last known traffic counters of a panel client, synced in the background."""
+
+    __tablename__ = "client_stats"
+    email: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+    inbound: Mapped[int] = mapped_column(nullable=False)
+    enable: Mapped[bool] = mapped_column(default=True)
+    up: Mapped[int] = mapped_column(BigInteger, default=0)
+    down: Mapped[int] = mapped_column(BigInteger, default=0)
+    total: Mapped[int] = mapped_column(BigInteger, default=0)
+    expiry_time: Mapped[int] = mapped_column(BigInteger, default=0)
+    synced_at: Mapped[datetime] = mapped_column(nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<ClientStat(email={self.email}, up={self.up}, down={self.down})>"
+
+
+class TrafficSample(Base):
+    """
+    Traffic delta of a panel client over [ts, ts + resolution) seconds.
+
+    resolution 0 holds raw deltas between two stats syncs; hourly and daily
+    rows are produced by the rollup job, which removes the rows it folds in.
+    """
+
+    __tablename__ = "traffic_samples"
+    __table_args__ = (UniqueConstraint("email", "resolution", "ts"),)
+    email: Mapped[str] = mapped_column(String(100), nullable=False)
+    resolution: Mapped[int] = mapped_column(nullable=False)
+    ts: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    up: Mapped[int] = mapped_column(BigInteger, default=0)
+    down: Mapped[int] = mapped_column(BigInteger, default=0)
+
+    def __repr__(self) -> str:
+        return f"<TrafficSample(email={self.email}, resolution={self.resolution}, ts={self.ts})>"
+
+
+class Broadcast(Base):
+    """
+    Admin message to every user, sent in batches of users ordered by id.
+
+    last_user_id is the checkpoint: users up to it have been processed, so a
+    restarted bot resumes after it. finished_at is NULL while it is running.
+    """
+
+    __tablename__ = "broadcasts"
+    text: Mapped[str] = mapped_column(String(4096), nullable=False)
+    author_chat_id: Mapped[int] = mapped_column(nullable=False)
+    last_user_id: Mapped[int] = mapped_column(default=0)
+    delivered: Mapped[int] = mapped_column(default=0)
+    blocked: Mapped[int] = mapped_column(default=0)
+    failed: Mapped[int] = mapped_column(default=0)
+    created_at: Mapped[datetime] = mapped_column(nullable=False)
+    finished_at: Mapped[datetime | None] = mapped_column(default=None)
+
+    def __repr__(self) -> str:
+        return f"<Broadcast(id={self.id}, last_user_id={self.last_user_id})>"
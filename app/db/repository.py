@@ -1,11 +1,67 @@
-from typing import Generic, Sequence, Type, TypeVar
-from sqlalchemy import select
+import datetime
+from dataclasses import dataclass
+from typing import Any, Generic, Mapping, Sequence, Type, TypeVar
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    and_,
+    case,
+    delete,
+    event,
+    func,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
 
-from app.db.models import Base, Connection, User
+from app.db.models import (
+    Base,
+    Broadcast,
+    ClientStat,
+    Connection,
+    TrafficSample,
+    User,
+)
+from app.db.user_cache import user_cache
 
 
 ModelType = TypeVar("ModelType", bound=Base)
+ItemType = TypeVar("ItemType")
+
+# Session.info flag: repositories only flush, whoever owns the session commits.
+UNIT_OF_WORK = "unit_of_work"
+
+
+@dataclass
+class Page(Generic[ItemType]):
+    """
+    One keyset page ordered by id, with flags for the neighbouring pages.
+    """
+
+    items: list[ItemType]
+    has_prev: bool
+    has_next: bool
+
+
+@dataclass
+class UserSummary:
+    """
+    User with aggregated connections: active are live and enabled, deleted
+    are gone from the panel, latest_expiry is over live connections.
+    """
+
+    user: User
+    total: int
+    active: int
+    deleted: int
+    latest_expiry: datetime.datetime | None
+
+    @property
+    def id(self) -> int:
+        return self.user.id
 
 
 class BaseRepository(Generic[ModelType]):
@@ -33,29 +89,228 @@ class BaseRepository(Generic[ModelType]):
         )
         return result.scalar_one_or_none()
 
-    async def create(self, **kwargs) -> ModelType:
+    async def get_page(
+        self,
+        *criteria: ColumnElement[bool],
+        cursor: int | None = None,
+        backward: bool = False,
+        limit: int = 20,
+    ) -> Page[ModelType]:
+        """
+        Keyset page ordered by id: up to limit rows with id > cursor, or with
+        id < cursor when backward. One extra row is fetched to tell whether
+        the page has a neighbour in the direction of travel.
+        """
+        stmt = self._keyset(select(self.model).where(*criteria), cursor, backward)
+        result = await self.session.execute(stmt.limit(limit + 1))
+        return self._page(list(result.scalars().all()), cursor, backward, limit)
+
+    def _keyset(self, stmt: Select, cursor: int | None, backward: bool) -> Select:
+        if backward:
+            if cursor is not None:
+                stmt = stmt.where(self.model.id < cursor)
+            return stmt.order_by(self.model.id.desc())
+        if cursor is not None:
+            stmt = stmt.where(self.model.id > cursor)
+        return stmt.order_by(self.model.id)
+
+    @staticmethod
+    def _page(
+        items: list[ItemType], cursor: int | None, backward: bool, limit: int
+    ) -> Page[ItemType]:
+        more = len(items) > limit
+        del items[limit:]
+        if backward:
+            items.reverse()
+            return Page(items, has_prev=more, has_next=cursor is not None)
+        return Page(items, has_prev=cursor is not None, has_next=more)
+
+    async def create(self, refresh: bool = False, **kwargs) -> ModelType:
         obj = self.model(**kwargs)
         self.session.add(obj)
-        await self.session.commit()
-        await self.session.refresh(obj)
+        await self._commit()
+        if refresh:
+            await self.session.refresh(obj)
         return obj
 
-    async def update(self, obj, **kwargs) -> ModelType:
+    async def update(self, obj, refresh: bool = False, **kwargs) -> ModelType:
         for key, value in kwargs.items():
             setattr(obj, key, value)
         self.session.add(obj)
-        await self.session.commit()
-        await self.session.refresh(obj)
+        await self._commit()
+        if refresh:
+            await self.session.refresh(obj)
         return obj
 
     async def delete(self, obj) -> None:
         await self.session.delete(obj)
-        await self.session.commit()
+        await self._commit()
+
+    async def create_many(self, rows: Sequence[Mapping[str, Any]]) -> int:
+        """
+        Insert rows with one executemany INSERT, bypassing the identity map.
+        """
+        if not rows:
+            return 0
+        connection = await self.session.connection()
+        result = await connection.execute(insert(self.model), list(rows))
+        await self._commit()
+        return result.rowcount
+
+    async def update_many(
+        self,
+        ids: Sequence[int],
+        *criteria: ColumnElement[bool],
+        chunk_size: int = 500,
+        **values: Any,
+    ) -> int:
+        """
+        Apply the same values to all ids matching the extra criteria, one
+        UPDATE ... WHERE id IN per chunk. Loaded objects are not synchronized.
+        """
+        count = 0
+        for start in range(0, len(ids), chunk_size):
+            result = await self.session.execute(
+                update(self.model)
+                .where(self.model.id.in_(ids[start : start + chunk_size]), *criteria)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            count += result.rowcount
+        await self._commit()
+        return count
+
+    async def upsert(
+        self,
+        rows: Sequence[Mapping[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Sequence[str] | None = None,
+    ) -> int:
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE as one executemany.
+        update_fields defaults to every other key of the rows; an empty
+        sequence turns the statement into DO NOTHING.
+        """
+        if not rows:
+            return 0
+        if update_fields is None:
+            update_fields = [key for key in rows[0] if key not in index_elements]
+        stmt = insert(self.model)
+        if update_fields:
+            stmt = stmt.on_conflict_do_update(
+                index_elements=index_elements,
+                set_={name: stmt.excluded[name] for name in update_fields},
+            )
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=index_elements)
+        connection = await self.session.connection()
+        result = await connection.execute(stmt, list(rows))
+        await self._commit()
+        return result.rowcount
+
+    async def _commit(self) -> None:
+        """
+        Commit, or only flush when the session is a unit of work
+        (see UNIT_OF_WORK): then the owner commits once at the end.
+        """
+        if self.session.info.get(UNIT_OF_WORK):
+            await self.session.flush()
+        else:
+            await self.session.commit()
+
+
+# Session.info keys: chat_ids to drop from the UserMiddleware cache on commit,
+# or a flag to drop the whole cache when a bulk UPDATE touched unknown users.
+_STALE_CHAT_IDS = "stale_chat_ids"
+_STALE_ALL_USERS = "stale_all_users"
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session) -> None:
+    if session.info.pop(_STALE_ALL_USERS, False):
+        user_cache.clear()
+    for chat_id in session.info.pop(_STALE_CHAT_IDS, ()):
+        user_cache.invalidate(chat_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_users(session: Session) -> None:
+    session.info.pop(_STALE_ALL_USERS, None)
+    session.info.pop(_STALE_CHAT_IDS, None)
 
 
 class UserRepository(BaseRepository[User]):
     model = User
 
+    # Every write drops the chat_id from the UserMiddleware cache once the
+    # transaction commits, whether that is here or at the end of the update.
+    async def create(self, refresh: bool = False, **kwargs) -> User:
+        self._invalidate_on_commit(kwargs.get("chat_id"))
+        return await super().create(refresh=refresh, **kwargs)
+
+    async def update(self, obj, refresh: bool = False, **kwargs) -> User:
+        self._invalidate_on_commit(obj.chat_id, kwargs.get("chat_id"))
+        return await super().update(obj, refresh=refresh, **kwargs)
+
+    async def delete(self, obj) -> None:
+        self._invalidate_on_commit(obj.chat_id)
+        await super().delete(obj)
+
+    async def create_many(self, rows: Sequence[Mapping[str, Any]]) -> int:
+        self._invalidate_on_commit(*(row.get("chat_id") for row in rows))
+        return await super().create_many(rows)
+
+    async def update_many(
+        self,
+        ids: Sequence[int],
+        *criteria: ColumnElement[bool],
+        chunk_size: int = 500,
+        **values: Any,
+    ) -> int:
+        self.session.info[_STALE_ALL_USERS] = True
+        return await super().update_many(
+            ids, *criteria, chunk_size=chunk_size, **values
+        )
+
+    async def upsert(
+        self,
+        rows: Sequence[Mapping[str, Any]],
+        index_elements: Sequence[str],
+        update_fields: Sequence[str] | None = None,
+    ) -> int:
+        self._invalidate_on_commit(*(row.get("chat_id") for row in rows))
+        return await super().upsert(rows, index_elements, update_fields)
+
+    def _invalidate_on_commit(self, *chat_ids: int | None) -> None:
+        stale = self.session.info.setdefault(_STALE_CHAT_IDS, set())
+        stale.update(chat_id for chat_id in chat_ids if chat_id is not None)
+
+    async def get_summary_page(
+        self,
+        cursor: int | None = None,
+        backward: bool = False,
+        limit: int = 20,
+    ) -> Page[UserSummary]:
+        """
+        Keyset page of users with connection counts, one grouped query.
+        """
+        live = Connection.exists_in_api.is_(True)
+        stmt = (
+            select(
+                self.model,
+                func.count(Connection.id),
+                func.count(case((and_(live, Connection.enabled.is_(True)), 1))),
+                func.count(case((Connection.exists_in_api.is_(False), 1))),
+                func.max(case((live, Connection.expired_at))),
+            )
+            .outerjoin(Connection, Connection.user_id == self.model.id)
+            .group_by(self.model.id)
+        )
+        stmt = self._keyset(stmt, cursor, backward)
+        result = await self.session.execute(stmt.limit(limit + 1))
+        summaries = [UserSummary(*row) for row in result.tuples()]
+        return self._page(summaries, cursor, backward, limit)
+
     async def get_by_username(self, username: str) -> User | None:
         result = await self.session.execute(
             select(self.model).where(self.model.username == username)
@@ -68,6 +323,20 @@ class UserRepository(BaseRepository[User]):
         )
         return result.scalar_one_or_none()
 
+    async def get_chat_ids_after(
+        self, after_id: int, limit: int
+    ) -> list[tuple[int, int]]:
+        """
+        (id, chat_id) of the next `limit` users with id > after_id, by id.
+        """
+        result = await self.session.execute(
+            select(self.model.id, self.model.chat_id)
+            .where(self.model.id > after_id)
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        return [(id, chat_id) for id, chat_id in result]
+
 
 class ConnectionRepository(BaseRepository[Connection]):
     model = Connection
@@ -86,3 +355,263 @@ class ConnectionRepository(BaseRepository[Connection]):
             stmt = stmt.where(self.model.exists_in_api)
         result = await self.session.execute(stmt)
         return list(result.scalars().all())
+
+    async def get_page_by_user_id(
+        self,
+        user_id: int,
+        show_deleted: bool = False,
+        cursor: int | None = None,
+        backward: bool = False,
+        limit: int = 20,
+    ) -> Page[Connection]:
+        criteria = [self.model.user_id == user_id]
+        if not show_deleted:
+            criteria.append(self.model.exists_in_api.is_(True))
+        return await self.get_page(
+            *criteria, cursor=cursor, backward=backward, limit=limit
+        )
+
+    async def get_expired(
+        self,
+        inbound: int,
+        now: datetime.datetime,
+        after_id: int = 0,
+        limit: int = 500,
+    ) -> list[Connection]:
+        """
+        Batch of live connections with expired_at <= now, ordered by id (keyset).
+        """
+        stmt = (
+            select(self.model)
+            .where(
+                self.model.inbound == inbound,
+                self.model.exists_in_api,
+                self.model.expired_at <= now,
+                self.model.id > after_id,
+            )
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def get_deleted(
+        self, inbound: int, after_id: int = 0, limit: int = 500
+    ) -> list[Connection]:
+        """
+        Batch of connections marked as deleted from the panel (keyset by id).
+        """
+        stmt = (
+            select(self.model)
+            .where(
+                self.model.inbound == inbound,
+                ~self.model.exists_in_api,
+                self.model.id > after_id,
+            )
+            .order_by(self.model.id)
+            .limit(limit)
+        )
+        result = await self.session.execute(stmt)
+        return list(result.scalars().all())
+
+    async def get_pending_expiries(self) -> list[tuple[int, datetime.datetime]]:
+        """
+        (id, expired_at) of every live and enabled connection.
+        """
+        result = await self.session.execute(
+            select(self.model.id, self.model.expired_at).where(
+                self.model.exists_in_api, self.model.enabled
+            )
+        )
+        return [(id, expired_at) for id, expired_at in result]
+
+    async def get_due(
+        self, ids: Sequence[int], now: datetime.datetime, chunk_size: int = 500
+    ) -> list[tuple[int, str, int]]:
+        """
+        (id, email, owner chat_id) of the given connections that are still live,
+        enabled and expired at now.
+        """
+        due: list[tuple[int, str, int]] = []
+        for start in range(0, len(ids), chunk_size):
+            result = await self.session.execute(
+                select(self.model.id, self.model.email, User.chat_id)
+                .join(self.model.user)
+                .where(
+                    self.model.id.in_(ids[start : start + chunk_size]),
+                    self.model.exists_in_api,
+                    self.model.enabled,
+                    self.model.expired_at <= now,
+                )
+            )
+            due.extend((id, email, chat_id) for id, email, chat_id in result)
+        return due
+
+    async def get_sync_state(
+        self, inbound: int
+    ) -> list[tuple[int, str, bool, bool, datetime.datetime]]:
+        """
+        (id, uuid, exists_in_api, enabled, expired_at) of every connection of
+        the inbound, without loading ORM objects.
+        """
+        result = await self.session.execute(
+            select(
+                self.model.id,
+                self.model.uuid,
+                self.model.exists_in_api,
+                self.model.enabled,
+                self.model.expired_at,
+            ).where(self.model.inbound == inbound)
+        )
+        return [
+            (id, uuid, exists, enabled, expired_at)
+            for id, uuid, exists, enabled, expired_at in result
+        ]
+
+    async def mark_deleted(self, ids: Sequence[int]) -> int:
+        """
+        Set exists_in_api=False for all ids.
+        """
+        return await self.update_many(ids, exists_in_api=False)
+
+
+class ClientStatRepository(BaseRepository[ClientStat]):
+    model = ClientStat
+
+    async def get_by_email(self, email: str) -> ClientStat | None:
+        result = await self.session.execute(
+            select(self.model).where(self.model.email == email)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_counters(self) -> dict[str, tuple[int, int]]:
+        """
+        Last synced (up, down) of every client, keyed by email.
+        """
+        result = await self.session.execute(
+            select(self.model.email, self.model.up, self.model.down)
+        )
+        return {email: (up, down) for email, up, down in result.tuples()}
+
+
+class TrafficSampleRepository(BaseRepository[TrafficSample]):
+    model = TrafficSample
+
+    async def add_raw(self, ts: int, deltas: Mapping[str, tuple[int, int]]) -> int:
+        """
+        Store raw (up, down) deltas taken at ts, one executemany for all emails.
+        """
+        if not deltas:
+            return 0
+        stmt = insert(self.model)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["email", "resolution", "ts"],
+            set_={
+                "up": self.model.up + stmt.excluded.up,
+                "down": self.model.down + stmt.excluded.down,
+            },
+        )
+        rows = [
+            {"email": email, "resolution": 0, "ts": ts, "up": up, "down": down}
+            for email, (up, down) in deltas.items()
+        ]
+        connection = await self.session.connection()
+        result = await connection.execute(stmt, rows)
+        await self._commit()
+        return result.rowcount
+
+    async def rollup(self, source: int, target: int, before: int) -> int:
+        """
+        Fold rows of resolution source with ts < before into target-sized
+        buckets (INSERT ... SELECT ... GROUP BY) and delete the folded rows.
+        before must be aligned to target so that buckets are not split.
+        """
+        bucket = self.model.ts - self.model.ts % target
+        folded = (
+            select(
+                self.model.email,
+                literal(target),
+                bucket,
+                func.sum(self.model.up),
+                func.sum(self.model.down),
+            )
+            .where(self.model.resolution == source, self.model.ts < before)
+            .group_by(self.model.email, bucket)
+        )
+        stmt = insert(self.model).from_select(
+            ["email", "resolution", "ts", "up", "down"], folded
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["email", "resolution", "ts"],
+            set_={
+                "up": self.model.up + stmt.excluded.up,
+                "down": self.model.down + stmt.excluded.down,
+            },
+        )
+        await self.session.execute(stmt)
+        result = await self.session.execute(
+            delete(self.model).where(
+                self.model.resolution == source, self.model.ts < before
+            )
+        )
+        await self._commit()
+        return result.rowcount
+
+    async def prune(self, resolution: int, before: int) -> int:
+        result = await self.session.execute(
+            delete(self.model).where(
+                self.model.resolution == resolution, self.model.ts < before
+            )
+        )
+        await self._commit()
+        return result.rowcount
+
+    async def get_total(self, email: str, since: int, until: int) -> tuple[int, int]:
+        """
+        Total (up, down) of email over [since, until) across all resolutions.
+        Rolled-up rows are counted whole by their bucket start.
+        """
+        result = await self.session.execute(
+            select(
+                func.coalesce(func.sum(self.model.up), 0),
+                func.coalesce(func.sum(self.model.down), 0),
+            ).where(
+                self.model.email == email,
+                self.model.ts >= since,
+                self.model.ts < until,
+            )
+        )
+        up, down = result.one()
+        return up, down
+
+    async def get_series(
+        self, email: str, since: int, until: int, step: int
+    ) -> list[tuple[int, int, int]]:
+        """
+        (bucket, up, down) points of email over [since, until) in step-second
+        buckets; step should not be finer than the stored resolution.
+        """
+        bucket = (self.model.ts - self.model.ts % step).label("bucket")
+        result = await self.session.execute(
+            select(bucket, func.sum(self.model.up), func.sum(self.model.down))
+            .where(
+                self.model.email == email,
+                self.model.ts >= since,
+                self.model.ts < until,
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        return [(ts, up, down) for ts, up, down in result.tuples()]
+
+
+class BroadcastRepository(BaseRepository[Broadcast]):
+    model = Broadcast
+
+    async def get_unfinished(self) -> list[Broadcast]:
+        result = await self.session.execute(
+            select(self.model)
+            .where(self.model.finished_at.is_(None))
+            .order_by(self.model.id)
+        )
+        return list(result.scalars().all())
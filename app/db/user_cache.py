@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+from app.db.config import USER_CACHE_SIZE, USER_CACHE_TTL
+from app.db.models import User
+
+
+class UserCache:
+    """
+    LRU cache chat_id -> detached User snapshot with a TTL.
+
+    Snapshots hold column values only and are never attached to a session;
+    copy() gives every update its own detached instance, which repositories
+    re-attach on write (session.add / relationship cascade).
+    Unregistered chat_ids are cached as None. Every invalidation bumps a
+    generation so that a lookup started before it cannot store a stale row.
+    """
+
+    def __init__(self, maxsize: int = USER_CACHE_SIZE, ttl: float = USER_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: OrderedDict[int, tuple[float, User | None]] = OrderedDict()
+        self._generation = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, chat_id: int) -> tuple[bool, User | None]:
+        """
+        (found, snapshot); found is False on a miss or an expired entry.
+        """
+        entry = self._entries.get(chat_id) if self.enabled else None
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._entries[chat_id]
+            self.misses += 1
+            return False, None
+        self._entries.move_to_end(chat_id)
+        self.hits += 1
+        return True, entry[1]
+
+    def put(self, chat_id: int, user: User | None, generation: int) -> None:
+        if not self.enabled or generation != self._generation:
+            return
+        self._entries[chat_id] = (time.monotonic() + self.ttl, _snapshot(user))
+        self._entries.move_to_end(chat_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, chat_id: int) -> None:
+        self._generation += 1
+        self._entries.pop(chat_id, None)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._entries.clear()
+
+    @staticmethod
+    def copy(snapshot: User) -> User:
+        return _snapshot(snapshot)  # type: ignore[return-value]
+
+    def stats(self) -> dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _snapshot(user: User | None) -> User | None:
+    if user is None:
+        return None
+    snapshot = User(
+        **{attr.key: getattr(user, attr.key) for attr in inspect(User).column_attrs}
+    )
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+user_cache = UserCache()
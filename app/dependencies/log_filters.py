@@ -17,9 +17,24 @@ class CriticalLogFilter(logging.Filter):
 
 
 class InternalLogFilter(logging.Filter):
+    """
+    Drop records from installed libraries except aiogram and the
+    sqlalchemy.engine logger (SQL echo is enabled explicitly via DB_ECHO).
+    A logger belongs to one package, so the decision is computed from the
+    first record of each logger and cached by logger name.
+    """
+
+    def __init__(self, name: str = "") -> None:
+        super().__init__(name)
+        self._decisions: dict[str, bool] = {}
+
     def filter(self, record):
-        return (
-            "venv" not in record.pathname
-            and "share" not in record.pathname
-            or "aiogram" in record.pathname
-        )
+        decision = self._decisions.get(record.name)
+        if decision is None:
+            decision = self._decisions[record.name] = (
+                record.name.startswith("sqlalchemy.engine")
+                or "venv" not in record.pathname
+                and "share" not in record.pathname
+                or "aiogram" in record.pathname
+            )
+        return decision
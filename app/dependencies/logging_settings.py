@@ -1,4 +1,12 @@
+import atexit
+import logging
+import logging.config
+import logging.handlers
+import os
 import sys
+from typing import Any
+
+from app.db.config import DB_ECHO
 
 from .log_filters import (
     DebugWarningLogFilter,
@@ -7,8 +15,13 @@ from .log_filters import (
     InternalLogFilter,
 )
 
+# Root level in production; DEBUG also lets through library debug records.
+LOG_LEVEL: str = (os.getenv("LOG_LEVEL") or "INFO").upper()
 
-logging_config = {
+# Loggers write to a queue; a listener thread formats records and writes them
+# to stdout, so a slow stdout (docker logs, a pipe) never blocks the event loop.
+# Use setup_logging(): dictConfig alone leaves the listener stopped.
+logging_config: dict[str, Any] = {
     "version": 1,
     "disable_existing_loggers": False,
     "formatters": {
@@ -35,9 +48,15 @@ logging_config = {
             "class": "logging.StreamHandler",
             "formatter": "default",
             "level": "DEBUG",
-            "filters": ["internal_filter"],
             "stream": sys.stdout,
         },
+        "queue": {
+            "class": "logging.handlers.QueueHandler",
+            "handlers": ["default"],
+            "respect_handler_level": True,
+            # Filter before enqueueing: dropped records are never formatted.
+            "filters": ["internal_filter"],
+        },
         # "all": {
         #     "class": "logging.StreamHandler",
         #     "formatter": "default",
@@ -60,6 +79,24 @@ logging_config = {
         #     "filters": ["critical_filter"],
         # },
     },
-    "loggers": {},
-    "root": {"level": "DEBUG", "formatter": "default", "handlers": ["default"]},
+    "loggers": {
+        # A line per handled update and per webhook request.
+        "aiogram.event": {"level": "WARNING"},
+        "aiohttp.access": {"level": "WARNING"},
+        "sqlalchemy.engine": {"level": "INFO" if DB_ECHO else "WARNING"},
+    },
+    "root": {"level": LOG_LEVEL, "handlers": ["queue"]},
 }
+
+
+def setup_logging(config: dict[str, Any] = logging_config) -> None:
+    """
+    Apply config and start the listener of its "queue" handler;
+    the listener is stopped (and the queue flushed) at exit.
+    """
+    logging.config.dictConfig(config)
+    handler = logging.getHandlerByName("queue")
+    listener = getattr(handler, "listener", None)
+    if isinstance(listener, logging.handlers.QueueListener):
+        listener.start()
+        atexit.register(listener.stop)
@@ -1,11 +1,22 @@
 import logging
+import time
 from aiogram import F, Router, types
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import cast
 
+from app.db.config import ADMIN_PAGE_SIZE
 from app.db.models import User
-from app.db.repository import ConnectionRepository, UserRepository
+from app.db.repository import (
+    ClientStatRepository,
+    ConnectionRepository,
+    TrafficSampleRepository,
+    UserRepository,
+)
 from app.dependencies.auth import get_admins_list
+from app.jobs.broadcast import Broadcaster, format_progress
 from app.kbds.menu_markups import (
     AdminAction,
     AdminActionData,
@@ -17,8 +28,6 @@ from app.kbds.menu_markups import (
     get_admin_userlist_markup,
     get_view_connection_markup,
 )
-from app.login_client import get_async_client
-from app.schemas import ClientStats
 
 
 admins: tuple[str, ...] = get_admins_list()
@@ -28,6 +37,10 @@ logger = logging.getLogger(__name__)
 router = Router()
 
 
+class BroadcastForm(StatesGroup):
+    text = State()
+
+
 async def _check_message_accessible(query: types.CallbackQuery) -> types.Message | None:
     """
     Проверяет доступность сообщения для обработки.
@@ -111,8 +124,12 @@ async def send_users_list(
         )
         return
 
-    users = await UserRepository(session).get_all()
-    if not users:
+    users = await UserRepository(session).get_summary_page(
+        cursor=callback_data.cursor,
+        backward=callback_data.backward,
+        limit=ADMIN_PAGE_SIZE,
+    )
+    if not users.items:
         await query.answer("❗️ Пользователи не найдены")
         logger.warning("Список пользователей пуст")
         return
@@ -122,14 +139,16 @@ async def send_users_list(
         return
 
     await query.answer()
-    await message.answer(
-        "Список пользователей:",
-        reply_markup=get_admin_userlist_markup(
-            chat_id=query.from_user.id,
-            user_id=user.id,
-            users=users,
-        ),
+    markup = get_admin_userlist_markup(
+        chat_id=query.from_user.id,
+        user_id=user.id,
+        users=users,
     )
+    # Листание страниц меняет клавиатуру текущего сообщения.
+    if callback_data.cursor is not None:
+        await message.edit_reply_markup(reply_markup=markup)
+    else:
+        await message.answer("Список пользователей:", reply_markup=markup)
 
 
 @router.callback_query(AdminActionData.filter(F.action == AdminAction.userconn))
@@ -162,10 +181,14 @@ async def send_user_connections(
         )
         return
 
-    connections = await ConnectionRepository(session).get_by_user_id(
-        user_id=callback_data.user_id, show_deleted=True
+    connections = await ConnectionRepository(session).get_page_by_user_id(
+        user_id=callback_data.user_id,
+        show_deleted=True,
+        cursor=callback_data.cursor,
+        backward=callback_data.backward,
+        limit=ADMIN_PAGE_SIZE,
     )
-    if not connections:
+    if not connections.items:
         await query.answer("❗️ Подключения не найдены")
         logger.warning(
             "Подключения не найдены для пользователя ID=%s", callback_data.user_id
@@ -177,14 +200,15 @@ async def send_user_connections(
         return
 
     await query.answer()
-    await message.answer(
-        "Подключения пользователя:",
-        reply_markup=get_admin_user_connections_markup(
-            chat_id=query.from_user.id,
-            user_id=callback_data.user_id,
-            connections=connections,
-        ),
+    markup = get_admin_user_connections_markup(
+        chat_id=query.from_user.id,
+        user_id=callback_data.user_id,
+        connections=connections,
     )
+    if callback_data.cursor is not None:
+        await message.edit_reply_markup(reply_markup=markup)
+    else:
+        await message.answer("Подключения пользователя:", reply_markup=markup)
 
 
 @router.callback_query(AdminActionData.filter(F.action == AdminAction.connstat))
@@ -195,7 +219,7 @@ async def send_connection_stats(
     session: AsyncSession,
 ) -> None:
     """
-    Отправляет статистику по выбранному подключению.
+    Отправляет статистику по выбранному подключению из таблицы client_stats.
 
     Args:
         query: Callback query от администратора
@@ -248,42 +272,128 @@ async def send_connection_stats(
         back_button=back_button,
         is_admin=user.admin,
     )
-    try:
-        api_client = get_async_client()
-        api_connection = await api_client.get_connection(uuid=connection.uuid)
-        if not api_connection:
-            await query.answer("❗️ Подключение не найдено в API")
-            await message.answer("Подключение в API отсутствует", reply_markup=markup)
-            logger.warning("Подключение не найдено в API (uuid: %s)", connection.uuid)
-            return
-
-        stats = await api_client.get_stats()
-        con_stats = stats.get(connection.email)
-        if not isinstance(con_stats, ClientStats):
-            await query.answer("❗️ Не удалось получить статистику")
-            logger.error("Ошибка получения статистики из API")
-            return
-
-        await query.answer(
-            "✅ Статистика подключения получена",
+    con_stats = await ClientStatRepository(session).get_by_email(connection.email)
+    if con_stats is None:
+        await query.answer("❗️ Статистика ещё не синхронизирована")
+        await message.answer(
+            "Статистика подключения пока не получена из API", reply_markup=markup
         )
+        logger.warning("Нет статистики в БД для %s", connection.email)
+        return
 
-        # Форматируем даты
-        created_at = connection.created_at.strftime("%Y-%m-%d %H:%M:%S")
-        expired_at = connection.expired_at.strftime("%Y-%m-%d %H:%M:%S")
+    await query.answer(
+        "✅ Статистика подключения получена",
+    )
 
-        # Отправляем сообщение с информацией о подключении
+    # Форматируем даты
+    created_at = connection.created_at.strftime("%Y-%m-%d %H:%M:%S")
+    expired_at = connection.expired_at.strftime("%Y-%m-%d %H:%M:%S")
+    synced_at = con_stats.synced_at.strftime("%Y-%m-%d %H:%M:%S")
+    now = int(time.time())
+    samples = TrafficSampleRepository(session)
+    day_up, day_down = await samples.get_total(connection.email, now - 86400, now + 1)
+    week_up, week_down = await samples.get_total(
+        connection.email, now - 7 * 86400, now + 1
+    )
+
+    # Отправляем сообщение с информацией о подключении
+    await message.answer(
+        f"📊 Статистика подключения:\n\n"
+        f"Email: {connection.email}\n"
+        f"Создано: {created_at}\n"
+        f"Истекает: {expired_at}\n"
+        f"Всего загружено: {con_stats.down / 1024 / 1024:.2f} MB\n"
+        f"Всего отправлено: {con_stats.up / 1024 / 1024:.2f} MB\n"
+        f"Общий трафик: {(con_stats.up + con_stats.down) / 1024 / 1024:.2f} MB\n"
+        f"За 24 часа: {(day_up + day_down) / 1024 / 1024:.2f} MB\n"
+        f"За 7 дней: {(week_up + week_down) / 1024 / 1024:.2f} MB\n"
+        f"Обновлено: {synced_at}",
+        reply_markup=markup,
+    )
+
+
+@router.callback_query(AdminActionData.filter(F.action == AdminAction.broadcast))
+async def ask_broadcast_text(
+    query: types.CallbackQuery,
+    user: User | None,
+    state: FSMContext,
+    broadcaster: Broadcaster,
+) -> None:
+    """
+    Показывает ход текущей рассылки или запрашивает текст новой.
+
+    Args:
+        query: Callback query от администратора
+        user: Текущий пользователь (администратор)
+        state: Состояние FSM администратора
+        broadcaster: Исполнитель рассылок
+    """
+    if not user or not user.admin:
+        await query.answer("❌ Недостаточно прав")
+        logger.warning(
+            "Попытка запустить рассылку без прав: %s", query.from_user.username
+        )
+        return
+
+    message = await _check_message_accessible(query)
+    if message is None:
+        return
+
+    await query.answer()
+    current = broadcaster.current
+    if current is not None:
         await message.answer(
-            f"📊 Статистика подключения:\n\n"
-            f"Email: {connection.email}\n"
-            f"Создано: {created_at}\n"
-            f"Истекает: {expired_at}\n"
-            f"Всего загружено: {con_stats.down / 1024 / 1024:.2f} MB\n"
-            f"Всего отправлено: {con_stats.up / 1024 / 1024:.2f} MB\n"
-            f"Общий трафик: {(con_stats.up + con_stats.down) / 1024 / 1024:.2f} MB",
-            reply_markup=markup,
+            f"📣 Идёт рассылка #{current.id}\n\n{format_progress(current)}"
         )
-    except Exception as e:
-        error_msg = f"Ошибка при получении статистики: {str(e)}"
-        logger.error(error_msg, exc_info=True)
-        await query.answer("❌ Произошла ошибка при получении статистики")
+        return
+
+    await state.set_state(BroadcastForm.text)
+    await message.answer(
+        "Отправьте текст рассылки одним сообщением.\n/cancel — отменить"
+    )
+
+
+@router.message(BroadcastForm.text, Command("cancel"))
+async def cancel_broadcast(message: types.Message, state: FSMContext) -> None:
+    """
+    Отмена ввода текста рассылки.
+    """
+    await state.clear()
+    await message.answer("Рассылка отменена")
+
+
+@router.message(BroadcastForm.text)
+async def start_broadcast(
+    message: types.Message,
+    user: User | None,
+    state: FSMContext,
+    broadcaster: Broadcaster,
+) -> None:
+    """
+    Запускает рассылку введённого текста всем пользователям.
+
+    Args:
+        message: Сообщение с текстом рассылки
+        user: Текущий пользователь (администратор)
+        state: Состояние FSM администратора
+        broadcaster: Исполнитель рассылок
+    """
+    if not user or not user.admin:
+        await state.clear()
+        await message.answer("❌ Недостаточно прав")
+        return
+
+    if not message.text:
+        await message.answer("❗️ Нужен текст. /cancel — отменить")
+        return
+
+    await state.clear()
+    broadcast = await broadcaster.start(message.text, message.chat.id)
+    logger.info(
+        "Администратор %s запустил рассылку #%s",
+        message.chat.username,
+        broadcast.id,
+    )
+    await message.answer(
+        f"📣 Рассылка #{broadcast.id} запущена, итог придёт отдельным сообщением"
+    )
@@ -1,11 +1,17 @@
 import logging
 import datetime
+import time
 from aiogram import F, Router, types
 from aiogram.filters import Command, CommandStart, or_f
 from sqlalchemy.ext.asyncio import AsyncSession
 from typing import cast
 
-from app.db.repository import ConnectionRepository, UserRepository
+from app.db.repository import (
+    ClientStatRepository,
+    ConnectionRepository,
+    TrafficSampleRepository,
+    UserRepository,
+)
 from app.dependencies.auth import get_admins_list
 from app.kbds.menu_markups import (
     UserAction,
@@ -16,7 +22,8 @@ from app.kbds.menu_markups import (
     get_view_connection_markup,
 )
 from app.db.models import User
-from app.login_client import get_async_client
+from app.jobs.expiry import ExpiryScheduler
+from app.login_client import APIClient
 
 router = Router()
 admins: tuple[str, ...] = get_admins_list()
@@ -126,6 +133,7 @@ async def op_me(
             user,
             admin=not user.admin,
         )
+        await session.commit()
     logger.info("User %s updated admin status to %s", message.chat.username, user.admin)
     await message.answer(f"OP successfully and your status: {user.admin}")
 
@@ -147,6 +155,7 @@ async def send_register(
             username=query.from_user.username,
             first_name=query.from_user.first_name,
         )
+        await session.commit()
         text = f"Охайо, {query.from_user.username}!🖖"
         logger.info("User %s registered successfully", query.from_user.username)
     else:
@@ -225,6 +234,8 @@ async def add_connection(
     callback_data: UserActionData,
     session: AsyncSession,
     user: User | None,
+    api_client: APIClient,
+    expiry_scheduler: ExpiryScheduler,
 ) -> None:
     """
     Создание нового подключения для пользователя.
@@ -234,6 +245,8 @@ async def add_connection(
         callback_data: Данные из callback
         session: Сессия базы данных
         user: Текущий пользователь
+        api_client: Клиент API панели
+        expiry_scheduler: Планировщик истечения подключений
     """
     expiry_time_days = 3
     logger.info("User %s requested to add a connection", query.from_user.username)
@@ -257,7 +270,6 @@ async def add_connection(
         return
 
     try:
-        api_client = get_async_client()
         email = await api_client.add_connection(
             username=username,
             tg_id=user.id,
@@ -279,7 +291,7 @@ async def add_connection(
         connection_url = api_client.create_link(connection, inbound)
 
         # Сохранение в базу данных
-        await ConnectionRepository(session).create(
+        db_connection = await ConnectionRepository(session).create(
             inbound=api_client.inbound_id,
             email=email,
             connection_url=connection_url,
@@ -290,6 +302,10 @@ async def add_connection(
             user=user,
             host="scvnotready.online",
         )
+        # Фиксируем до ответа: иначе блокировка записи SQLite держится,
+        # пока ответ ждёт в очереди отправки.
+        await session.commit()
+        expiry_scheduler.schedule(db_connection.id, db_connection.expired_at)
 
         logger.info("Подключение успешно создано для %s", query.from_user.username)
         await query.answer("✅ Подключение успешно создано")
@@ -356,6 +372,18 @@ async def view_connection(
     # Форматирование дат в местную временную зону
     created_at = connection.created_at.strftime("%Y-%m-%d %H:%M:%S")
     expired_at = connection.expired_at.strftime("%Y-%m-%d %H:%M:%S")
+    con_stats = await ClientStatRepository(session).get_by_email(connection.email)
+    traffic = (
+        f"\nТрафик: {(con_stats.up + con_stats.down) / 1024 / 1024:.2f} MB"
+        if con_stats is not None
+        else ""
+    )
+    now = int(time.time())
+    up, down = await TrafficSampleRepository(session).get_total(
+        connection.email, now - 86400, now + 1
+    )
+    if up or down:
+        traffic += f"\nЗа 24 часа: {(up + down) / 1024 / 1024:.2f} MB"
 
     await query.answer("✅ Подключение найдено")
 
@@ -376,7 +404,8 @@ async def view_connection(
         f"Email: {connection.email}\n"
         f"URL: <code>{connection.connection_url}</code>\n"
         f"Создано: {created_at}\n"
-        f"Истекает: {expired_at}",
+        f"Истекает: {expired_at}"
+        f"{traffic}",
         reply_markup=get_view_connection_markup(
             chat_id=query.from_user.id,
             user_id=user.id,
@@ -394,6 +423,8 @@ async def delete_connection(
     callback_data: UserActionData,
     session: AsyncSession,
     user: User | None,
+    api_client: APIClient,
+    expiry_scheduler: ExpiryScheduler,
 ) -> None:
     """
     Удаление подключения пользователя.
@@ -403,6 +434,8 @@ async def delete_connection(
         callback_data: Данные из callback
         session: Сессия базы данных
         user: Текущий пользователь
+        api_client: Клиент API панели
+        expiry_scheduler: Планировщик истечения подключений
     """
     logger.info("Запрос на удаление подключения от %s", query.from_user.username)
 
@@ -427,7 +460,6 @@ async def delete_connection(
             logger.error("Подключение не найдено в БД для %s", query.from_user.username)
             return
 
-        api_client = get_async_client()
         existing_connection = await api_client.get_connection(uuid=connection.uuid)
 
         if existing_connection:
@@ -450,6 +482,7 @@ async def delete_connection(
             )
 
         # Удаление или обновление записи в БД
+        expiry_scheduler.cancel(connection.id)
         if callback_data.absolute_delete:
             await ConnectionRepository(session).delete(connection)
             logger.info(
@@ -460,6 +493,8 @@ async def delete_connection(
             logger.info(
                 "Подключение помечено как удаленное для %s", query.from_user.username
             )
+        # Фиксируем до ответа, как в add_connection.
+        await session.commit()
 
         await query.answer("✅ Подключение успешно удалено")
 
@@ -0,0 +1,164 @@
+"""
+Потоковый разбор ответа panel/api/inbounds/list.
+
+Тело ответа читается из aiohttp по частям. Сканер отслеживает только
+вложенность скобок вне строк, поэтому inbound с чужим id пропускается без
+буферизации и без построения объектов, а в память попадают лишь байты
+нужного inbound.
+"""
+
+import re
+from typing import AsyncGenerator, Collection
+
+import aiohttp
+
+from app.schemas import SInbound, json_loads, parse_inbound_lazy
+
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Всё до следующей скобки вне строк: обычные символы и целые строки.
+# Possessive-квантификаторы исключают экспоненциальный откат на обрезанной строке.
+_STRING = rb'"(?:[^"\\]++|\\.)*+"'
+_RUN = re.compile(rb'(?:[^"{}\[\]]++|' + _STRING + rb")*+")
+# Внутри inbound плоские объекты (записи clientStats) пропускаются целиком.
+_RUN_NESTED = re.compile(
+    rb'(?:[^"{}\[\]]++|' + _STRING + rb'|\{(?:[^"{}\[\]]++|' + _STRING + rb")*+\})*+"
+)
+# Продолжение строки, начатой в предыдущем чанке.
+_STRING_BODY = re.compile(rb'(?:[^"\\]++|\\.)*+')
+_OBJ_START = re.compile(rb'"obj"\s*:\s*(?:(\[)|null)')
+# Панель отдаёт "id" первым ключом inbound; иначе inbound буферизуется целиком.
+_INBOUND_ID = re.compile(rb'\{\s*"id"\s*:\s*(-?\d+)')
+_INBOUND_ID_PREFIX = re.compile(rb'\{\s*(?:"(?:i(?:d(?:"\s*(?::\s*-?\d*)?)?)?)?)?$')
+
+
+class InboundStreamParser:
+    """
+    Инкрементальный сканер списка inbound.
+
+    feed() принимает очередной чанк и возвращает сырые байты inbound, которые
+    закончились в этом чанке и id которых входит в inbound_ids (или все,
+    если inbound_ids не задан).
+    """
+
+    def __init__(self, inbound_ids: Collection[int] | None = None) -> None:
+        self.inbound_ids = inbound_ids
+        self.done = False
+        self.skipped = 0
+        self._buf = bytearray()
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._array_depth: int | None = None
+        self._start: int | None = None
+        self._capture = False
+
+    def feed(self, data: bytes) -> list[bytes]:
+        if self.done:
+            return []
+        self._buf += data
+        found: list[bytes] = []
+        if self._array_depth is None and not self._find_array():
+            return found
+        while not self.done and self._step(found):
+            pass
+        self._compact()
+        return found
+
+    def _find_array(self) -> bool:
+        match = _OBJ_START.search(self._buf)
+        if match is None:
+            return False
+        if match.group(1) is None:
+            self.done = True
+            return False
+        self._pos = match.end()
+        self._depth = self._array_depth = 1
+        return True
+
+    def _step(self, found: list[bytes]) -> bool:
+        buf = self._buf
+        if self._in_string:
+            end = _STRING_BODY.match(buf, self._pos).end()  # type: ignore[union-attr]
+            if end < len(buf) and buf[end] == ord('"'):
+                self._in_string = False
+                self._pos = end + 1
+                return True
+            self._pos = end
+            return False
+
+        run = _RUN if self._depth == self._array_depth else _RUN_NESTED
+        end = run.match(buf, self._pos).end()  # type: ignore[union-attr]
+        if end >= len(buf):
+            self._pos = end
+            return False
+        char = buf[end]
+        self._pos = end + 1
+        if char == ord('"'):
+            self._in_string = True
+        elif char in b"{[":
+            if self._depth == self._array_depth and char == ord("{"):
+                if not self._begin_inbound(end):
+                    self._pos = end
+                    return False
+            self._depth += 1
+        else:
+            self._depth -= 1
+            if self._depth == self._array_depth and self._start is not None:
+                if self._capture:
+                    found.append(bytes(buf[self._start : end + 1]))
+                else:
+                    self.skipped += 1
+                self._start = None
+            elif self._depth < self._array_depth:  # type: ignore[operator]
+                self.done = True
+        return True
+
+    def _begin_inbound(self, start: int) -> bool:
+        """
+        Решает, нужен ли inbound, начинающийся с позиции start.
+        Возвращает False, если для решения не хватает данных.
+        """
+        self._start = start
+        if self.inbound_ids is None:
+            self._capture = True
+            return True
+        match = _INBOUND_ID.match(self._buf, start)
+        if match is None or match.end() == len(self._buf):
+            if _INBOUND_ID_PREFIX.match(self._buf, start):
+                self._start = None
+                return False
+            self._capture = True
+            return True
+        self._capture = int(match.group(1)) in self.inbound_ids
+        return True
+
+    def _compact(self) -> None:
+        keep_from = self._pos
+        if self._start is not None and self._capture:
+            keep_from = self._start
+            self._start = 0
+        elif self._start is not None:
+            self._start = 0
+        del self._buf[:keep_from]
+        self._pos -= keep_from
+
+
+async def iter_inbounds(
+    response: aiohttp.ClientResponse,
+    inbound_ids: Collection[int] | None = None,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> AsyncGenerator[SInbound, None]:
+    """
+    Читает тело ответа по частям и отдаёт нужные inbound по мере готовности.
+    """
+    parser = InboundStreamParser(inbound_ids)
+    async for chunk in response.content.iter_chunked(chunk_size):
+        for raw in parser.feed(chunk):
+            inbound = parse_inbound_lazy(json_loads(raw))
+            # Inbound без "id" в начале захватывается целиком и проверяется здесь.
+            if inbound_ids is None or inbound.id in inbound_ids:
+                yield inbound
+        if parser.done:
+            break
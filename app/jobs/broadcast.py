@@ -0,0 +1,153 @@
+"""
+Рассылка сообщения администратора всем пользователям.
+
+Получатели читаются из users пачками по id (keyset, id > last_user_id), так
+что в памяти держится не больше одной пачки при любом числе пользователей.
+Пачка отправляется через SendScheduler с приоритетом bulk, после чего в
+Broadcast записываются last_user_id и счётчики. После перезапуска рассылка
+продолжается с last_user_id: повторно может уйти не больше одной пачки.
+
+Рассылки выполняются по одной в порядке создания; по окончании автор
+получает итог: доставлено, заблокировали бота, ошибки.
+"""
+
+import asyncio
+import datetime
+import logging
+from collections import Counter
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.models import Broadcast
+from app.db.repository import BroadcastRepository, UserRepository
+from app.middlewares.send_scheduler import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором рассылки, прерванной ошибкой БД.
+RETRY_DELAY = 60.0
+
+
+class Broadcaster:
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        bot: Bot,
+        read_session_maker: async_sessionmaker[AsyncSession] | None = None,
+        batch_size: int = 100,
+    ) -> None:
+        self.session_maker = session_maker
+        self.read_session_maker = read_session_maker or session_maker
+        self.bot = bot
+        self.batch_size = batch_size
+        # Выполняемая рассылка, её счётчики обновляются после каждой пачки.
+        self.current: Broadcast | None = None
+        self._wakeup = asyncio.Event()
+
+    async def start(self, text: str, author_chat_id: int) -> Broadcast:
+        """
+        Сохраняет рассылку и будит run(); отправка идёт в фоне.
+        """
+        async with self.session_maker() as session:
+            broadcast = await BroadcastRepository(session).create(
+                text=text,
+                author_chat_id=author_chat_id,
+                created_at=datetime.datetime.now(datetime.UTC),
+            )
+        self._wakeup.set()
+        logger.info("Рассылка #%s создана %s", broadcast.id, author_chat_id)
+        return broadcast
+
+    async def run(self) -> None:
+        """
+        Выполняет незавершённые рассылки, включая прерванные перезапуском.
+        """
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            try:
+                async with self.session_maker() as session:
+                    pending = await BroadcastRepository(session).get_unfinished()
+                for broadcast in pending:
+                    await self._deliver(broadcast)
+            except Exception:
+                logger.exception("Ошибка рассылки, повтор через %s с", RETRY_DELAY)
+                timeout = RETRY_DELAY
+            finally:
+                self.current = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except TimeoutError:
+                pass
+
+    async def _deliver(self, broadcast: Broadcast) -> None:
+        self.current = broadcast
+        logger.info(
+            "Рассылка #%s: отправка после пользователя %s",
+            broadcast.id,
+            broadcast.last_user_id,
+        )
+        with bulk_sends():
+            while True:
+                async with self.read_session_maker() as session:
+                    recipients = await UserRepository(session).get_chat_ids_after(
+                        broadcast.last_user_id, self.batch_size
+                    )
+                if not recipients:
+                    break
+                outcomes = Counter(
+                    await asyncio.gather(
+                        *(
+                            self._send(chat_id, broadcast.text)
+                            for _, chat_id in recipients
+                        )
+                    )
+                )
+                async with self.session_maker() as session:
+                    await BroadcastRepository(session).update(
+                        broadcast,
+                        last_user_id=recipients[-1][0],
+                        delivered=broadcast.delivered + outcomes["delivered"],
+                        blocked=broadcast.blocked + outcomes["blocked"],
+                        failed=broadcast.failed + outcomes["failed"],
+                    )
+
+        async with self.session_maker() as session:
+            await BroadcastRepository(session).update(
+                broadcast, finished_at=datetime.datetime.now(datetime.UTC)
+            )
+        logger.info(
+            "Рассылка #%s завершена: доставлено %s, заблокировали %s, ошибок %s",
+            broadcast.id,
+            broadcast.delivered,
+            broadcast.blocked,
+            broadcast.failed,
+        )
+        try:
+            await self.bot.send_message(
+                broadcast.author_chat_id,
+                f"📣 Рассылка #{broadcast.id} завершена\n\n{format_progress(broadcast)}",
+            )
+        except TelegramAPIError as e:
+            logger.warning("Не удалось отправить итог рассылки: %s", e)
+
+    async def _send(self, chat_id: int, text: str) -> str:
+        try:
+            await self.bot.send_message(chat_id, text)
+        except TelegramForbiddenError:
+            # Пользователь заблокировал бота или удалил аккаунт.
+            return "blocked"
+        except TelegramAPIError as e:
+            logger.warning("Рассылка не доставлена %s: %s", chat_id, e)
+            return "failed"
+        return "delivered"
+
+
+def format_progress(broadcast: Broadcast) -> str:
+    return (
+        f"Доставлено: {broadcast.delivered}\n"
+        f"Заблокировали бота: {broadcast.blocked}\n"
+        f"Ошибок: {broadcast.failed}"
+    )
@@ -0,0 +1,198 @@
+"""
+Очистка панели от истёкших и осиротевших клиентов.
+
+Истёкшие: подключения с exists_in_api=True и expired_at в прошлом. Они
+удаляются из панели, а в БД помечаются exists_in_api=False.
+Осиротевшие: подключения, уже помеченные удалёнными в БД, но всё ещё
+присутствующие в панели (например, удаление из API не удалось). Они только
+удаляются из панели.
+
+Запуск вручную: python -m app.jobs.cleanup [--dry-run]
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import CLEANUP_BATCH_SIZE, CLEANUP_CONCURRENCY, get_session_maker
+from app.db.models import Connection
+from app.db.repository import ConnectionRepository
+from app.dependencies.logging_settings import setup_logging
+from app.login_client import APIClient, get_async_client
+from app.schemas import SInbound
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CleanupReport:
+    dry_run: bool = False
+    scanned: int = 0
+    expired: int = 0
+    orphaned: int = 0
+    deleted: int = 0
+    failed: int = 0
+    marked: int = 0
+    elapsed: float = 0.0
+    failed_uuids: list[str] = field(default_factory=list)
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def deletes_per_second(self) -> float:
+        return self.deleted / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        mode = "dry-run" if self.dry_run else "applied"
+        return (
+            f"cleanup ({mode}): scanned={self.scanned} expired={self.expired} "
+            f"orphaned={self.orphaned} deleted={self.deleted} failed={self.failed} "
+            f"marked={self.marked} elapsed={self.elapsed:.2f}s "
+            f"({self.rows_per_second:.0f} rows/s, {self.deletes_per_second:.1f} deletes/s)"
+        )
+
+
+async def _delete_from_panel(
+    connections: list[Connection],
+    api_client: APIClient,
+    report: CleanupReport,
+    concurrency: int,
+) -> set[str]:
+    """
+    Удаляет клиентов из панели и возвращает uuid, которых там больше нет.
+    """
+    uuids = [connection.uuid for connection in connections]
+    if report.dry_run:
+        report.deleted += len(uuids)
+        return set(uuids)
+    results = await api_client.delete_connections(uuids, concurrency=concurrency)
+    gone = {uuid for uuid, success in results.items() if success}
+    report.deleted += len(gone)
+    failed = [uuid for uuid, success in results.items() if not success]
+    report.failed += len(failed)
+    report.failed_uuids.extend(failed)
+    return gone
+
+
+async def _cleanup_expired(
+    session_maker: async_sessionmaker[AsyncSession],
+    api_client: APIClient,
+    inbound: SInbound,
+    report: CleanupReport,
+    now: datetime.datetime,
+    batch_size: int,
+    concurrency: int,
+) -> None:
+    after_id = 0
+    while True:
+        # Сессия не держится открытой во время запросов к панели.
+        async with session_maker() as session:
+            batch = await ConnectionRepository(session).get_expired(
+                api_client.inbound_id, now, after_id=after_id, limit=batch_size
+            )
+        if not batch:
+            return
+        after_id = batch[-1].id
+        report.scanned += len(batch)
+        report.expired += len(batch)
+
+        present = inbound.get_clients(uuids=[c.uuid for c in batch])
+        in_panel = [c for c in batch if c.uuid in present]
+        gone = await _delete_from_panel(in_panel, api_client, report, concurrency)
+        # Клиентов, которых в панели уже нет, тоже помечаем удалёнными.
+        ids = [c.id for c in batch if c.uuid in gone or c.uuid not in present]
+        if report.dry_run:
+            report.marked += len(ids)
+            continue
+        async with session_maker() as session:
+            report.marked += await ConnectionRepository(session).mark_deleted(ids)
+
+
+async def _cleanup_orphaned(
+    session_maker: async_sessionmaker[AsyncSession],
+    api_client: APIClient,
+    inbound: SInbound,
+    report: CleanupReport,
+    batch_size: int,
+    concurrency: int,
+) -> None:
+    after_id = 0
+    while True:
+        async with session_maker() as session:
+            batch = await ConnectionRepository(session).get_deleted(
+                api_client.inbound_id, after_id=after_id, limit=batch_size
+            )
+        if not batch:
+            return
+        after_id = batch[-1].id
+        report.scanned += len(batch)
+
+        present = inbound.get_clients(uuids=[c.uuid for c in batch])
+        orphans = [c for c in batch if c.uuid in present]
+        report.orphaned += len(orphans)
+        await _delete_from_panel(orphans, api_client, report, concurrency)
+
+
+async def run_cleanup(
+    session_maker: async_sessionmaker[AsyncSession],
+    api_client: APIClient,
+    dry_run: bool = False,
+    batch_size: int = CLEANUP_BATCH_SIZE,
+    concurrency: int = CLEANUP_CONCURRENCY,
+) -> CleanupReport:
+    """
+    Один проход очистки. Подключения читаются батчами по id, проверяются по
+    одному снимку inbound, удаляются из панели не более чем concurrency
+    запросами одновременно, а флаг exists_in_api меняется одним UPDATE на батч.
+    """
+    report = CleanupReport(dry_run=dry_run)
+    started = time.perf_counter()
+    inbound = await api_client.get_inbound(refresh=True)
+    if inbound is None:
+        logger.error("Очистка пропущена: inbound %s не найден", api_client.inbound_id)
+        return report
+
+    now = datetime.datetime.now(datetime.UTC)
+    # Сироты ищутся первыми: истёкшие подключения этого прохода помечаются
+    # удалёнными, но остаются в снимке inbound.
+    await _cleanup_orphaned(
+        session_maker, api_client, inbound, report, batch_size, concurrency
+    )
+    await _cleanup_expired(
+        session_maker, api_client, inbound, report, now, batch_size, concurrency
+    )
+    report.elapsed = time.perf_counter() - started
+    logger.info("%s", report)
+    if report.failed_uuids:
+        logger.warning("Не удалось удалить из панели: %s", report.failed_uuids)
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=CLEANUP_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CLEANUP_CONCURRENCY)
+    args = parser.parse_args()
+
+    setup_logging()
+    async with get_async_client() as api_client:
+        report = await run_cleanup(
+            get_session_maker(),
+            api_client,
+            dry_run=args.dry_run,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+        )
+    print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,183 @@
+"""
+Планировщик истечения подключений по Connection.expired_at.
+
+Сроки живых подключений загружаются один раз в min-heap. Задача спит до
+ближайшего срока (или до появления более раннего) и обрабатывает все
+наступившие сроки одной пачкой: выключает подключения в БД одним UPDATE и
+уведомляет владельцев. Создание и удаление подключений меняют heap точечно
+через schedule()/cancel(), без повторного чтения таблицы.
+
+Сам клиент в панели выключается по expiryTime, заданному при создании,
+поэтому планировщик не обращается к панели.
+"""
+
+import asyncio
+import datetime
+import heapq
+import logging
+import time
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.repository import ConnectionRepository
+from app.middlewares.send_scheduler import bulk_sends
+
+logger = logging.getLogger(__name__)
+
+# Верхняя граница сна: страхует от перевода системных часов.
+MAX_SLEEP = 3600.0
+# Через сколько секунд повторить сроки, которые не удалось обработать.
+RETRY_DELAY = 10.0
+
+
+def _timestamp(moment: datetime.datetime) -> float:
+    # SQLite возвращает naive datetime, записанный в UTC.
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.UTC)
+    return moment.timestamp()
+
+
+class ExpiryScheduler:
+    """
+    Heap (срок, id подключения) с ленивым удалением.
+
+    Актуальный срок каждого подключения хранится в _deadlines; записи heap,
+    не совпадающие с ним, считаются отменёнными и пропускаются при извлечении.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        bot: Bot | None = None,
+        read_session_maker: async_sessionmaker[AsyncSession] | None = None,
+    ) -> None:
+        self.session_maker = session_maker
+        self.read_session_maker = read_session_maker or session_maker
+        self.bot = bot
+        self.fired = 0
+        self.notified = 0
+        self._heap: list[tuple[float, int]] = []
+        self._deadlines: dict[int, float] = {}
+        # Отмены, пришедшие до окончания load(), применяются к загруженным срокам.
+        self._loaded = False
+        self._cancelled: set[int] = set()
+        self._wakeup = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    async def load(self) -> int:
+        """
+        Полная загрузка сроков из БД, выполняется один раз при старте.
+        """
+        async with self.read_session_maker() as session:
+            rows = await ConnectionRepository(session).get_pending_expiries()
+        deadlines = {id: _timestamp(expired_at) for id, expired_at in rows}
+        for connection_id in self._cancelled:
+            deadlines.pop(connection_id, None)
+        deadlines.update(self._deadlines)
+        self._deadlines = deadlines
+        self._cancelled.clear()
+        self._loaded = True
+        self._heap = [(deadline, id) for id, deadline in self._deadlines.items()]
+        heapq.heapify(self._heap)
+        self._wakeup.set()
+        logger.info("Загружено сроков истечения: %s", len(self._deadlines))
+        return len(self._deadlines)
+
+    def schedule(self, connection_id: int, expired_at: datetime.datetime) -> None:
+        deadline = _timestamp(expired_at)
+        self._deadlines[connection_id] = deadline
+        heapq.heappush(self._heap, (deadline, connection_id))
+        if self._heap[0] == (deadline, connection_id):
+            self._wakeup.set()
+
+    def cancel(self, connection_id: int) -> None:
+        self._deadlines.pop(connection_id, None)
+        if not self._loaded:
+            self._cancelled.add(connection_id)
+        # Отменённые записи остаются в heap; перестраиваем его, когда их много.
+        if len(self._heap) > 2 * len(self._deadlines) + 1024:
+            self._heap = [(d, id) for id, d in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _pop_due(self, now: float) -> list[int]:
+        due: list[int] = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, connection_id = heapq.heappop(self._heap)
+            if self._deadlines.get(connection_id) == deadline:
+                del self._deadlines[connection_id]
+                due.append(connection_id)
+        return due
+
+    def _retry(self, ids: list[int], deadline: float) -> None:
+        """
+        Возвращает в heap сроки после ошибки; get_due при повторе заново
+        проверит их по БД. Сроки, назначенные заново за это время, остаются.
+        """
+        for connection_id in ids:
+            if connection_id not in self._deadlines:
+                self._deadlines[connection_id] = deadline
+                heapq.heappush(self._heap, (deadline, connection_id))
+
+    def _next_delay(self, now: float) -> float:
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return MAX_SLEEP
+        return min(max(self._heap[0][0] - now, 0.0), MAX_SLEEP)
+
+    async def run(self) -> None:
+        # До загрузки schedule()/cancel() копятся в _deadlines/_cancelled,
+        # так что ошибка чтения откладывает старт, но не теряет изменений.
+        while not self._loaded:
+            try:
+                await self.load()
+            except Exception:
+                logger.exception(
+                    "Ошибка загрузки сроков истечения, повтор через %s с", RETRY_DELAY
+                )
+                await asyncio.sleep(RETRY_DELAY)
+        while True:
+            self._wakeup.clear()
+            due = self._pop_due(time.time())
+            if due:
+                try:
+                    await self._expire(due)
+                except Exception:
+                    logger.exception(
+                        "Ошибка обработки истёкших подключений, повтор через %s с",
+                        RETRY_DELAY,
+                    )
+                    self._retry(due, time.time() + RETRY_DELAY)
+                continue
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self._next_delay(time.time())
+                )
+            except TimeoutError:
+                pass
+
+    async def _expire(self, ids: list[int]) -> None:
+        now = datetime.datetime.now(datetime.UTC)
+        async with self.session_maker() as session:
+            repository = ConnectionRepository(session)
+            # Срок мог измениться в БД после загрузки: перепроверяем.
+            due = await repository.get_due(ids, now)
+            await repository.update_many([id for id, _, _ in due], enabled=False)
+        self.fired += len(due)
+        logger.info("Истекло подключений: %s", len(due))
+        if self.bot is None:
+            return
+        # Уведомления пропускают вперёд ответы пользователям.
+        with bulk_sends():
+            for _, email, chat_id in due:
+                try:
+                    await self.bot.send_message(
+                        chat_id, f"⌛️ Срок действия подключения {email} истёк"
+                    )
+                    self.notified += 1
+                except TelegramAPIError as e:
+                    logger.warning("Не удалось уведомить %s: %s", chat_id, e)
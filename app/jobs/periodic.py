@@ -0,0 +1,22 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+
+async def run_periodically(
+    job: Callable[[], Awaitable[Any]], interval: float, name: str
+) -> None:
+    """
+    Запускает job каждые interval секунд. Ошибка одного запуска
+    логируется и не останавливает следующие.
+    """
+    while True:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Фоновая задача %s завершилась с ошибкой", name)
+        await asyncio.sleep(interval)
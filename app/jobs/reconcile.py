@@ -0,0 +1,157 @@
+"""
+Сверка флагов Connection с панелью.
+
+Клиенты, удалённые или выключенные прямо в панели, не меняют записи в БД.
+Задача сравнивает все подключения inbound с одним снимком панели через
+операции над множествами uuid:
+
+- живые в БД, но отсутствующие в панели -> exists_in_api=False;
+- выключенные/включённые в панели -> enabled приводится к состоянию панели;
+- клиенты панели без записи в БД только попадают в отчёт (сироты).
+
+Подключения читаются из БД до запроса к панели, поэтому созданное во время
+сверки подключение в худшем случае окажется в отчёте сиротой.
+
+Запуск вручную: python -m app.jobs.reconcile [--dry-run]
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import get_session_maker
+from app.db.models import Connection
+from app.db.repository import ConnectionRepository
+from app.dependencies.logging_settings import setup_logging
+from app.jobs.expiry import ExpiryScheduler
+from app.login_client import APIClient, get_async_client
+
+logger = logging.getLogger(__name__)
+
+# Сколько uuid сирот выводить в лог.
+ORPHANS_LOGGED = 20
+
+
+@dataclass
+class ReconcileReport:
+    dry_run: bool = False
+    db_rows: int = 0
+    panel_clients: int = 0
+    missing: int = 0
+    disabled: int = 0
+    enabled: int = 0
+    orphans: list[str] = field(default_factory=list)
+    fetch_elapsed: float = 0.0
+    diff_elapsed: float = 0.0
+    write_elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        mode = "dry-run" if self.dry_run else "applied"
+        return (
+            f"reconcile ({mode}): db={self.db_rows} panel={self.panel_clients} "
+            f"missing={self.missing} disabled={self.disabled} "
+            f"enabled={self.enabled} orphans={len(self.orphans)} "
+            f"fetch={self.fetch_elapsed:.2f}s diff={self.diff_elapsed:.3f}s "
+            f"write={self.write_elapsed:.2f}s"
+        )
+
+
+async def run_reconcile(
+    session_maker: async_sessionmaker[AsyncSession],
+    api_client: APIClient,
+    dry_run: bool = False,
+    read_session_maker: async_sessionmaker[AsyncSession] | None = None,
+    expiry_scheduler: ExpiryScheduler | None = None,
+) -> ReconcileReport:
+    """
+    Один проход сверки: одно чтение подключений (через read_session_maker,
+    если задан), один снимок inbound и не более трёх групп UPDATE ... WHERE id IN.
+    Снова включённые подключения передаются в expiry_scheduler.
+    """
+    report = ReconcileReport(dry_run=dry_run)
+    # БД читается до снимка панели: подключение, созданное между ними, есть
+    # в панели, но не в rows, и не может быть принято за удалённое из панели.
+    started = time.perf_counter()
+    async with (read_session_maker or session_maker)() as session:
+        rows = await ConnectionRepository(session).get_sync_state(api_client.inbound_id)
+    read_elapsed = time.perf_counter() - started
+
+    started = time.perf_counter()
+    inbound = await api_client.get_inbound(refresh=True)
+    report.fetch_elapsed = time.perf_counter() - started
+    if inbound is None:
+        logger.error("Сверка пропущена: inbound %s не найден", api_client.inbound_id)
+        return report
+
+    started = time.perf_counter()
+    panel = inbound.clients_by_id.keys()
+    panel_disabled = inbound.disabled_client_ids
+    # Истёкшие подключения выключает планировщик, в панели они остаются enable.
+    now = datetime.datetime.now(datetime.UTC).replace(tzinfo=None)
+    live = {uuid: id for id, uuid, exists, _, _ in rows if exists}
+    on = {uuid: id for id, uuid, exists, enabled, _ in rows if exists and enabled}
+    off = {
+        uuid: (id, expired_at)
+        for id, uuid, exists, enabled, expired_at in rows
+        if exists and not enabled and expired_at > now
+    }
+
+    missing = [live[uuid] for uuid in live.keys() - panel]
+    to_disable = [on[uuid] for uuid in on.keys() & panel_disabled]
+    to_enable = dict(off[uuid] for uuid in (off.keys() & panel) - panel_disabled)
+    report.orphans = sorted(panel - {row[1] for row in rows})
+    report.db_rows = len(rows)
+    report.panel_clients = len(panel)
+    report.diff_elapsed = read_elapsed + time.perf_counter() - started
+
+    started = time.perf_counter()
+    if dry_run:
+        report.missing = len(missing)
+        report.disabled = len(to_disable)
+        report.enabled = len(to_enable)
+    else:
+        async with session_maker() as session:
+            repository = ConnectionRepository(session)
+            report.missing = await repository.mark_deleted(missing)
+            report.disabled = await repository.update_many(to_disable, enabled=False)
+            # Срок мог истечь между чтением и записью.
+            report.enabled = await repository.update_many(
+                list(to_enable), Connection.expired_at > now, enabled=True
+            )
+        if expiry_scheduler is not None:
+            # Планировщик загружает только включённые подключения. Если срок
+            # успел истечь и строка не включилась, get_due её пропустит.
+            for connection_id, expired_at in to_enable.items():
+                expiry_scheduler.schedule(connection_id, expired_at)
+    report.write_elapsed = time.perf_counter() - started
+
+    logger.info("%s", report)
+    if report.orphans:
+        logger.warning(
+            "Клиенты панели без записи в БД (%s): %s",
+            len(report.orphans),
+            report.orphans[:ORPHANS_LOGGED],
+        )
+    return report
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    setup_logging()
+    async with get_async_client() as api_client:
+        report = await run_reconcile(
+            get_session_maker(), api_client, dry_run=args.dry_run
+        )
+    print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
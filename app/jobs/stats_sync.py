@@ -0,0 +1,122 @@
+"""
+Фоновая синхронизация счётчиков трафика из панели в таблицу client_stats.
+
+За один проход inbound запрашивается у панели один раз, а все clientStats
+записываются в БД пачками INSERT ... ON CONFLICT. Разница с предыдущим
+снимком сохраняется в traffic_samples как сырые точки истории трафика.
+Просмотр статистики в боте читает только БД и не обращается к панели.
+
+Запуск вручную: python -m app.jobs.stats_sync
+"""
+
+import asyncio
+import datetime
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import get_session_maker
+from app.db.repository import (
+    UNIT_OF_WORK,
+    ClientStatRepository,
+    TrafficSampleRepository,
+)
+from app.dependencies.logging_settings import setup_logging
+from app.login_client import APIClient, get_async_client
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class StatsSyncReport:
+    synced: int = 0
+    samples: int = 0
+    fetch_elapsed: float = 0.0
+    write_elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"stats sync: synced={self.synced} samples={self.samples} "
+            f"fetch={self.fetch_elapsed:.2f}s write={self.write_elapsed:.2f}s"
+        )
+
+
+def _traffic_deltas(
+    previous: dict[str, tuple[int, int]], rows: list[dict]
+) -> dict[str, tuple[int, int]]:
+    """
+    Ненулевой прирост (up, down) относительно прошлого снимка. Клиенты без
+    прошлого снимка только задают точку отсчёта; после сброса счётчиков в
+    панели приростом считается новое значение.
+    """
+    deltas: dict[str, tuple[int, int]] = {}
+    for row in rows:
+        last = previous.get(row["email"])
+        if last is None:
+            continue
+        up = row["up"] - last[0] if row["up"] >= last[0] else row["up"]
+        down = row["down"] - last[1] if row["down"] >= last[1] else row["down"]
+        if up or down:
+            deltas[row["email"]] = (up, down)
+    return deltas
+
+
+async def sync_client_stats(
+    session_maker: async_sessionmaker[AsyncSession],
+    api_client: APIClient,
+) -> StatsSyncReport:
+    """
+    Один проход синхронизации: свежий снимок inbound и upsert всех clientStats.
+    """
+    report = StatsSyncReport()
+    started = time.perf_counter()
+    inbound = await api_client.get_inbound(refresh=True)
+    report.fetch_elapsed = time.perf_counter() - started
+    if inbound is None:
+        logger.error(
+            "Синхронизация статистики пропущена: inbound %s не найден",
+            api_client.inbound_id,
+        )
+        return report
+
+    synced_at = datetime.datetime.now(datetime.UTC)
+    rows = [
+        {
+            "email": stats.email,
+            "inbound": stats.inboundId,
+            "enable": stats.enable,
+            "up": stats.up,
+            "down": stats.down,
+            "total": stats.total,
+            "expiry_time": stats.expiryTime,
+            "synced_at": synced_at,
+        }
+        for stats in inbound.clientStats
+    ]
+    started = time.perf_counter()
+    # Счётчики и прирост пишутся одной транзакцией: если запись истории
+    # упадёт, счётчики не сдвинутся и прирост попадёт в следующий проход.
+    async with session_maker(info={UNIT_OF_WORK: True}) as session:
+        repository = ClientStatRepository(session)
+        previous = await repository.get_counters()
+        report.synced = await repository.upsert(rows, ["email"])
+        report.samples = await TrafficSampleRepository(session).add_raw(
+            int(synced_at.timestamp()), _traffic_deltas(previous, rows)
+        )
+        await session.commit()
+    report.write_elapsed = time.perf_counter() - started
+    logger.info("%s", report)
+    return report
+
+
+async def main() -> None:
+    setup_logging()
+    async with get_async_client() as api_client:
+        report = await sync_client_stats(get_session_maker(), api_client)
+    print(report)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
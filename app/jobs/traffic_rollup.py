@@ -0,0 +1,90 @@
+"""
+Свёртка истории трафика в traffic_samples: сырые точки -> часы -> сутки.
+
+Сырые точки старше TRAFFIC_RAW_RETENTION сворачиваются в часовые, часовые
+старше TRAFFIC_HOURLY_RETENTION — в суточные, суточные старше
+TRAFFIC_DAILY_RETENTION удаляются. Так размер таблицы ограничен числом
+клиентов, а не временем работы бота.
+
+Запуск вручную: python -m app.jobs.traffic_rollup
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import (
+    TRAFFIC_DAILY_RETENTION,
+    TRAFFIC_HOURLY_RETENTION,
+    TRAFFIC_RAW_RETENTION,
+    get_session_maker,
+)
+from app.db.repository import TrafficSampleRepository
+from app.dependencies.logging_settings import setup_logging
+
+logger = logging.getLogger(__name__)
+
+RAW = 0
+HOUR = 3600
+DAY = 86400
+
+
+@dataclass
+class RollupReport:
+    raw_folded: int = 0
+    hourly_folded: int = 0
+    daily_pruned: int = 0
+    elapsed: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"traffic rollup: raw->hourly={self.raw_folded} "
+            f"hourly->daily={self.hourly_folded} pruned={self.daily_pruned} "
+            f"elapsed={self.elapsed:.2f}s"
+        )
+
+
+def _align(ts: int, step: int) -> int:
+    return ts - ts % step
+
+
+async def rollup_traffic(
+    session_maker: async_sessionmaker[AsyncSession],
+    now: float | None = None,
+    raw_retention: int = TRAFFIC_RAW_RETENTION,
+    hourly_retention: int = TRAFFIC_HOURLY_RETENTION,
+    daily_retention: int = TRAFFIC_DAILY_RETENTION,
+) -> RollupReport:
+    """
+    Один проход свёртки. Каждый уровень сворачивается одним INSERT ... SELECT
+    с GROUP BY и одним DELETE.
+    """
+    report = RollupReport()
+    started = time.perf_counter()
+    current = int(time.time() if now is None else now)
+    async with session_maker() as session:
+        repository = TrafficSampleRepository(session)
+        report.raw_folded = await repository.rollup(
+            RAW, HOUR, _align(current - raw_retention, HOUR)
+        )
+        report.hourly_folded = await repository.rollup(
+            HOUR, DAY, _align(current - hourly_retention, DAY)
+        )
+        report.daily_pruned = await repository.prune(
+            DAY, _align(current - daily_retention, DAY)
+        )
+    report.elapsed = time.perf_counter() - started
+    logger.info("%s", report)
+    return report
+
+
+async def main() -> None:
+    setup_logging()
+    print(await rollup_traffic(get_session_maker()))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
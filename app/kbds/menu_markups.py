@@ -5,7 +5,8 @@ from typing import Sequence, Tuple
 
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 
-from app.db.models import Connection, User
+from app.db.models import Connection
+from app.db.repository import Page, UserSummary
 
 
 class UserAction(str, Enum):
@@ -48,7 +49,7 @@ class AdminAction(str, Enum):
 
     userlist = "userlist"
     userconn = "userconn"
-    requests = "requests"
+    broadcast = "broadcast"
     connstat = "connstat"
     opuser = "opuser"
     deleteuser = "deleteuser"
@@ -66,12 +67,17 @@ class AdminActionData(CallbackData, prefix="admin"):  # type: ignore[call-arg]
         chat_id (int): ID чата, где происходит действие.
         user_id (int): ID целевого пользователя.
         connection_id (int | None): ID подключения, если применимо.
+        cursor (int | None): ID последней (или первой при backward) записи
+            предыдущей страницы списка.
+        backward (bool): Листать список назад от cursor.
     """
 
     action: AdminAction
     chat_id: int
     user_id: int
     connection_id: int | None = None
+    cursor: int | None = None
+    backward: bool = False
 
 
 def create_back_button(
@@ -227,9 +233,9 @@ def get_admin_actions_markup(
             ).pack(),
         ),
         InlineKeyboardButton(
-            text=str("Запросы"),
+            text=str("Рассылка"),
             callback_data=AdminActionData(
-                action=AdminAction.requests, chat_id=chat_id, user_id=user_id
+                action=AdminAction.broadcast, chat_id=chat_id, user_id=user_id
             ).pack(),
         ),
     )
@@ -237,24 +243,61 @@ def get_admin_actions_markup(
     return builder.as_markup()
 
 
+def get_page_buttons(
+    page: Page,
+    callback_data: AdminActionData,
+) -> list[InlineKeyboardButton]:
+    """Кнопки перехода на соседние страницы списка с тем же действием."""
+    buttons = []
+    if page.has_prev and page.items:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️",
+                callback_data=callback_data.model_copy(
+                    update={"cursor": page.items[0].id, "backward": True}
+                ).pack(),
+            )
+        )
+    if page.has_next and page.items:
+        buttons.append(
+            InlineKeyboardButton(
+                text="➡️",
+                callback_data=callback_data.model_copy(
+                    update={"cursor": page.items[-1].id, "backward": False}
+                ).pack(),
+            )
+        )
+    return buttons
+
+
 def get_admin_userlist_markup(
     chat_id: int,
     user_id: int,
-    users: list[User],
+    users: Page[UserSummary],
 ) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for i, user in enumerate(users, 1):
+    for i, summary in enumerate(users.items, 1):
+        text = f"{summary.user.username} ✅{summary.active}/{summary.total}"
+        if summary.latest_expiry:
+            text += f" до {summary.latest_expiry:%d.%m}"
         builder.add(
             InlineKeyboardButton(
-                text=f"{user.username}",
+                text=text,
                 callback_data=AdminActionData(
                     action=AdminAction.userconn,
                     chat_id=chat_id,
-                    user_id=user.id,
+                    user_id=summary.id,
                 ).pack(),
             )
         )
-    builder.add(
+    builder.adjust(2)
+    page_buttons = get_page_buttons(
+        users,
+        AdminActionData(action=AdminAction.userlist, chat_id=chat_id, user_id=user_id),
+    )
+    if page_buttons:
+        builder.row(*page_buttons)
+    builder.row(
         InlineKeyboardButton(
             text=str("Назад"),
             callback_data=UserActionData(
@@ -262,17 +305,16 @@ def get_admin_userlist_markup(
             ).pack(),
         )
     )
-    builder.adjust(2)
     return builder.as_markup()
 
 
 def get_admin_user_connections_markup(
     chat_id: int,
     user_id: int,
-    connections: list[Connection],
+    connections: Page[Connection],
 ) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    for i, connection in enumerate(connections, 1):
+    for i, connection in enumerate(connections.items, 1):
         builder.add(
             InlineKeyboardButton(
                 text=f"{'❌' if not connection.exists_in_api else '✅'} {connection.email}",
@@ -284,7 +326,14 @@ def get_admin_user_connections_markup(
                 ).pack(),
             )
         )
-    builder.add(
+    builder.adjust(2)
+    page_buttons = get_page_buttons(
+        connections,
+        AdminActionData(action=AdminAction.userconn, chat_id=chat_id, user_id=user_id),
+    )
+    if page_buttons:
+        builder.row(*page_buttons)
+    builder.row(
         InlineKeyboardButton(
             text=str("Назад"),
             callback_data=AdminActionData(
@@ -292,7 +341,6 @@ def get_admin_user_connections_markup(
             ).pack(),
         )
     )
-    builder.adjust(2)
     return builder.as_markup()
 
 
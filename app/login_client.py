@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import json
 import logging
@@ -5,30 +6,106 @@ from uuid import uuid4
 import aiohttp
 import random
 import string
+from contextlib import aclosing, asynccontextmanager
+from typing import AsyncIterator, Iterable, Mapping, Sequence
 
-from app.db.config import BASE_URL, DEFAULT_INBOUND, VPN_PASSWORD, VPN_USERNAME
-from app.schemas import ClientStats, Response, SClient, SInbound
+from app.db.config import (
+    BASE_URL,
+    DEFAULT_INBOUND,
+    INBOUND_CACHE_TTL,
+    INBOUND_PARSE_MODE,
+    INBOUND_STREAMING,
+    PANEL_BULK_CHUNK_SIZE,
+    PANEL_KEEPALIVE_TIMEOUT,
+    PANEL_POOL_SIZE,
+    PANEL_REQUEST_TIMEOUT,
+    VPN_PASSWORD,
+    VPN_USERNAME,
+)
+from app.inbound_stream import iter_inbounds
+from app.schemas import (
+    ClientStats,
+    SClient,
+    SCreatedConnection,
+    SInbound,
+    json_loads,
+    parse_inbound_list,
+)
 
 
 logger = logging.getLogger(__name__)
 
 
 class APIClient:
+    """
+    Клиент API панели.
+
+    Один экземпляр рассчитан на весь процесс: сессия aiohttp с пулом
+    keep-alive соединений создаётся при первом запросе, логин выполняется
+    один раз и повторяется только при истечении cookies.
+
+    Снимок inbound кэшируется на inbound_ttl секунд; параллельные вызовы
+    get_inbound() ждут один общий запрос к панели. В режиме streaming список
+    inbound читается потоково и в память попадает только нужный inbound.
+    """
+
     def __init__(
-        self, base_url: str, username: str, password: str, inbound_id: int
+        self,
+        base_url: str,
+        username: str,
+        password: str,
+        inbound_id: int,
+        pool_size: int = PANEL_POOL_SIZE,
+        keepalive_timeout: float = PANEL_KEEPALIVE_TIMEOUT,
+        request_timeout: float = PANEL_REQUEST_TIMEOUT,
+        inbound_ttl: float = INBOUND_CACHE_TTL,
+        parse_mode: str = INBOUND_PARSE_MODE,
+        streaming: bool = INBOUND_STREAMING,
     ) -> None:
         self.payload = {"username": username, "password": password}
         self.username = username
         self.password = password
         self.base_url = base_url
         self.inbound_id = inbound_id
+        self.pool_size = pool_size
+        self.keepalive_timeout = keepalive_timeout
+        self.request_timeout = request_timeout
         self.session: aiohttp.ClientSession | None = None
+        self._session_lock = asyncio.Lock()
+        self._login_lock = asyncio.Lock()
+        self._login_generation = 0
+        self.inbound_ttl = inbound_ttl
+        self.parse_mode = parse_mode
+        self.streaming = streaming
+        self._inbound: SInbound | None = None
+        self._inbound_expires_at = 0.0
+        self._inbound_fetch: asyncio.Task[SInbound | None] | None = None
+        self._inbound_generation = 0
+
+    def _create_session(self) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_size,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=300,
+        )
+        return aiohttp.ClientSession(
+            base_url=self.base_url,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.request_timeout),
+        )
 
-    async def _get_session(self):
+    async def _get_session(self) -> aiohttp.ClientSession:
         if self.session is None:
-            session = aiohttp.ClientSession(base_url=self.base_url)
-            self.session = session
-            await self.login()
+            async with self._session_lock:
+                if self.session is None:
+                    session = self._create_session()
+                    self.session = session
+                    try:
+                        await self.login()
+                    except Exception:
+                        await self.close()
+                        raise
         return self.session
 
     async def __aenter__(self):
@@ -45,99 +122,165 @@ class APIClient:
 
     async def login(self) -> dict:
         if self.session is None:
-            self.session = await self._get_session()
+            self.session = self._create_session()
         async with self.session.post("login", json=self.payload) as response:
             response.raise_for_status()
             data = await response.json()
             # Cookies from the response are automatically stored in self.session.cookie_jar.
+            self._login_generation += 1
             return data
 
+    async def _relogin(self, generation: int) -> None:
+        """
+        Обновляет cookies, если их ещё не обновил параллельный запрос.
+        """
+        async with self._login_lock:
+            if self._login_generation == generation:
+                await self.login()
+
     async def _get(self, url: str, **kwargs) -> dict:
-        if self.session is None:
-            async with self:
-                response = await self._request("GET", url, **kwargs)
-                return response
-        else:
-            response = await self._request("GET", url, **kwargs)
-            return response
+        return await self._request("GET", url, **kwargs)
 
     async def _post(self, url: str, **kwargs) -> dict:
-        if self.session is None:
-            async with self:
-                response = await self._request("POST", url, **kwargs)
-                return response
-        else:
-            response = await self._request("POST", url, **kwargs)
-            return response
+        return await self._request("POST", url, **kwargs)
 
     async def request(self, method: str, url: str, **kwargs) -> dict:
         """Deprecated
         -----
         Use _get or _post instead."""
-        if self.session is None:
-            async with self:
-                response = await self._request(method, url, **kwargs)
-                return response
-        else:
-            response = await self._request(method, url, **kwargs)
-            return response
+        return await self._request(method, url, **kwargs)
 
     async def _request(self, method: str, url: str, **kwargs) -> dict:
-        if self.session is None:
-            raise RuntimeError("Session is not initialized")
+        async with self._open(method, url, **kwargs) as response:
+            return await response.json(loads=json_loads)
 
-        request = self.session.get if method == "GET" else self.session.post
+    @asynccontextmanager
+    async def _open(
+        self, method: str, url: str, **kwargs
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """
+        Выполняет запрос и отдаёт ответ с непрочитанным телом.
+        """
+        session = await self._get_session()
+        request = session.get if method == "GET" else session.post
+        generation = self._login_generation
 
         async with request(url, **kwargs) as response:
             content_type = response.headers.get("Content-Type", "")
             # If the response status is 401 or returns HTML (expired cookies), refresh cookies.
-            if response.status == 401 or "text" in content_type:
-                logger.info(
-                    "Cookies expired or received unexpected HTML, refreshing cookies."
-                )
-                await self.login()  # refresh cookies
-                async with request(url, **kwargs) as retry_response:
-                    retry_response.raise_for_status()
-                    return await retry_response.json()
-            response.raise_for_status()
-            return await response.json()
+            if response.status != 401 and "text" not in content_type:
+                response.raise_for_status()
+                yield response
+                return
+            logger.info(
+                "Cookies expired or received unexpected HTML, refreshing cookies."
+            )
+        await self._relogin(generation)  # refresh cookies
+        async with request(url, **kwargs) as retry_response:
+            retry_response.raise_for_status()
+            yield retry_response
 
     async def get_inbound_list(self) -> list[SInbound]:
-        if self.session is None:
-            async with self:
-                response = await self._get("panel/api/inbounds/list")
-        else:
-            response = await self._get("panel/api/inbounds/list")
+        response = await self._get("panel/api/inbounds/list")
 
         try:
-            resp = Response.model_validate(response)
+            return parse_inbound_list(response, validate=self.parse_mode == "validated")
         except Exception as e:
             logger.exception(f"Error parsing response: {e}")
             logger.exception(f"Response content: {response}")
             return []
-        return resp.obj
 
-    async def get_inbound(self) -> SInbound | None:
+    async def get_inbound(self, refresh: bool = False) -> SInbound | None:
         """
         Get inbound by id.
+
+        The snapshot is cached for inbound_ttl seconds. Concurrent callers
+        share a single in-flight request; refresh=True skips the cache.
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            not refresh
+            and self._inbound is not None
+            and loop.time() < self._inbound_expires_at
+        ):
+            return self._inbound
+
+        fetch = self._inbound_fetch
+        if fetch is None or refresh:
+            fetch = asyncio.create_task(self._fetch_inbound())
+            fetch.add_done_callback(self._on_inbound_fetched)
+            self._inbound_fetch = fetch
+        # shield: cancelling one waiter must not cancel the fetch for the others.
+        return await asyncio.shield(fetch)
+
+    def _on_inbound_fetched(self, fetch: asyncio.Task[SInbound | None]) -> None:
+        if self._inbound_fetch is fetch:
+            self._inbound_fetch = None
+        if not fetch.cancelled():
+            # Mark the exception as retrieved when every waiter has gone away.
+            fetch.exception()
+
+    async def _stream_inbound(self) -> SInbound | None:
+        """
+        Get inbound by id, reading inbounds/list incrementally.
+        Other inbounds are skipped without being parsed.
         """
-        inbounds = await self.get_inbound_list()
-        inbound = next((i for i in inbounds if i.id == self.inbound_id), None)
+        async with self._open("GET", "panel/api/inbounds/list") as response:
+            async with aclosing(iter_inbounds(response, {self.inbound_id})) as inbounds:
+                inbound = await anext(inbounds, None)
+            # An unread body closes the connection; drain the tail unparsed
+            # so the keep-alive connection goes back to the pool.
+            async for _ in response.content.iter_any():
+                pass
+            response.release()
+        return inbound
+
+    async def iter_clients(self) -> AsyncIterator[SClient]:
+        """
+        Stream clients of the inbound without caching the snapshot.
+        Each client is validated only when it is yielded.
+        """
+        inbound = await self._stream_inbound()
+        if inbound is None:
+            return
+        for client in inbound.settings.clients:
+            yield client
+
+    async def _fetch_inbound(self) -> SInbound | None:
+        generation = self._inbound_generation
+        if self.streaming:
+            inbound = await self._stream_inbound()
+        else:
+            inbounds = await self.get_inbound_list()
+            inbound = next((i for i in inbounds if i.id == self.inbound_id), None)
         if not inbound:
             return None
+        # Snapshot requested before a write must not be cached after it.
+        if generation == self._inbound_generation and self.inbound_ttl > 0:
+            self._inbound = inbound
+            self._inbound_expires_at = asyncio.get_running_loop().time() + (
+                self.inbound_ttl
+            )
         return inbound
 
-    async def get_stats(self) -> dict[str, ClientStats]:
+    def invalidate_inbound(self) -> None:
+        """
+        Drop the cached inbound snapshot. Called after every write to the panel.
+        """
+        self._inbound = None
+        self._inbound_expires_at = 0.0
+        self._inbound_generation += 1
+        self._inbound_fetch = None
+
+    async def get_stats(self) -> Mapping[str, ClientStats]:
         """
         Get users stats from the inbound.
         """
         inbound = await self.get_inbound()
         if not inbound:
             return {}
-        stats = {}
-        for client in inbound.clientStats:
-            stats[client.email] = client
-        return stats
+        # Index of the cached snapshot, must not be modified by callers.
+        return inbound.stats_by_email
 
     @staticmethod
     def create_link(client: SClient, inbound: SInbound) -> str | None:
@@ -160,10 +303,10 @@ class APIClient:
         inbound = await self.get_inbound()
         if not inbound:
             return None
-        for client in inbound.settings.clients:
-            if email == client.email:
-                return self.create_link(client, inbound)
-        return None
+        client = inbound.get_client(email=email)
+        if client is None:
+            return None
+        return self.create_link(client, inbound)
 
     async def get_connection(
         self,
@@ -177,20 +320,33 @@ class APIClient:
             inbound = await self.get_inbound()
         if not inbound:
             return None
-        for client in inbound.settings.clients:
-            if uuid and uuid == client.id or email and email == client.email:
-                return client
-        return None
+        return inbound.get_client(uuid=uuid, email=email)
 
-    async def add_connection(
+    async def get_connections(
         self,
+        uuids: Iterable[str] = (),
+        emails: Iterable[str] = (),
+        inbound: SInbound | None = None,
+    ) -> dict[str, SClient]:
+        """
+        Resolve many connections with one inbound snapshot. Returns a dict
+        keyed by the requested uuid/email; missing connections are left out.
+        """
+        if inbound is None:
+            inbound = await self.get_inbound()
+        if not inbound:
+            return {}
+        return inbound.get_clients(uuids=uuids, emails=emails)
+
+    @staticmethod
+    def _new_client(
         username: str,
         tg_id: int | None = None,
         limit_ip: int = 0,
         expiry_time_days: int = 0,
-    ) -> str | None:
+    ) -> dict:
         """
-        Add a new connection to the inbound and return email string or None if failed.
+        Build the panel payload of a new client with random uuid and subId.
         """
         uuid = str(uuid4())
         email_id: str = uuid.replace("-", "")[:10]
@@ -203,50 +359,157 @@ class APIClient:
             days=expiry_time_days
         )
         timestamp_time = int(expired_time.timestamp() * 1000)
+        return {
+            "id": uuid,
+            "flow": "xtls-rprx-vision",
+            "email": email,
+            "limitIp": limit_ip,
+            "totalGB": 0,
+            "expiryTime": timestamp_time,
+            "enable": True,
+            "tgId": tg_id,
+            "subId": sub_id_random,
+            "comment": "",
+            "reset": 0,
+        }
 
-        form_data = aiohttp.FormData(
-            {
-                "id": self.inbound_id,
-                "settings": json.dumps(
-                    {
-                        "clients": [
-                            {
-                                "id": uuid,
-                                "flow": "xtls-rprx-vision",
-                                "email": email,
-                                "limitIp": limit_ip,
-                                "totalGB": 0,
-                                "expiryTime": timestamp_time,
-                                "enable": True,
-                                "tgId": tg_id,
-                                "subId": sub_id_random,
-                                "comment": "",
-                                "reset": 0,
-                            }
-                        ]
-                    }
-                ),
-            }
-        )
+    async def _add_clients(self, clients: list[dict]) -> bool:
+        """
+        Submit clients to the inbound in a single addClient call.
+        """
+        # A plain dict (not FormData) so the body can be resent after a re-login.
+        try:
+            response = await self._post(
+                "panel/inbound/addClient",
+                data={
+                    "id": self.inbound_id,
+                    "settings": json.dumps({"clients": clients}),
+                },
+            )
+        finally:
+            # On a timeout or ClientError the panel may have applied the write.
+            self.invalidate_inbound()
+        return bool(response.get("success"))
 
-        response = await self._post(
-            "panel/inbound/addClient",
-            data=form_data,
-        )
-        if response.get("success"):
-            return email
+    async def add_connection(
+        self,
+        username: str,
+        tg_id: int | None = None,
+        limit_ip: int = 0,
+        expiry_time_days: int = 0,
+    ) -> str | None:
+        """
+        Add a new connection to the inbound and return email string or None if failed.
+        """
+        client = self._new_client(username, tg_id, limit_ip, expiry_time_days)
+        if await self._add_clients([client]):
+            return client["email"]
         return None
 
+    async def add_connections_bulk(
+        self,
+        usernames: Sequence[str],
+        tg_id: int | None = None,
+        limit_ip: int = 0,
+        expiry_time_days: int = 0,
+        chunk_size: int = PANEL_BULK_CHUNK_SIZE,
+    ) -> list[SCreatedConnection]:
+        """
+        Add one connection per username, sending chunk_size clients per
+        addClient call. Returns the created connections with their links;
+        clients of a rejected chunk are left out.
+        """
+        created: list[SCreatedConnection] = []
+        if not usernames:
+            return created
+        # Links only need the inbound stream settings, which do not change here.
+        inbound = await self.get_inbound()
+        if not inbound:
+            return created
+
+        for start in range(0, len(usernames), chunk_size):
+            chunk = [
+                self._new_client(username, tg_id, limit_ip, expiry_time_days)
+                for username in usernames[start : start + chunk_size]
+            ]
+            try:
+                success = await self._add_clients(chunk)
+            except TimeoutError:
+                # The panel may still have added them: log the emails to check.
+                logger.error(
+                    "addClient timed out, state unknown for %s",
+                    [client["email"] for client in chunk],
+                )
+                success = False
+            except aiohttp.ClientError:
+                logger.exception("addClient failed for chunk starting at %s", start)
+                success = False
+            if not success:
+                logger.error(
+                    "Panel rejected %s clients starting at %s", len(chunk), start
+                )
+                continue
+            for client in chunk:
+                created.append(
+                    SCreatedConnection(
+                        email=client["email"],
+                        uuid=client["id"],
+                        sub_id=client["subId"],
+                        expiry_time=client["expiryTime"],
+                        link=self.create_link(
+                            SClient.model_construct(**client), inbound
+                        ),
+                    )
+                )
+        logger.info("Created %s of %s connections", len(created), len(usernames))
+        return created
+
     async def delete_connection(self, uuid: str) -> bool:
         """
         Delete a connection by its UUID and return True if successful, False otherwise.
         """
+        try:
+            return await self._delete_client(uuid)
+        finally:
+            self.invalidate_inbound()
+
+    async def _delete_client(self, uuid: str) -> bool:
         link = f"panel/inbound/{self.inbound_id}/delClient/{uuid}"
         response = await self._post(link)
         if response.get("success"):
             return True
         return False
 
+    async def delete_connections(
+        self, uuids: Iterable[str], concurrency: int = 8
+    ) -> dict[str, bool]:
+        """
+        Delete many connections with at most `concurrency` requests in flight.
+        Returns uuid -> success; the inbound cache is invalidated once.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def delete(uuid: str) -> bool:
+            async with semaphore:
+                try:
+                    return await self._delete_client(uuid)
+                except (aiohttp.ClientError, TimeoutError):
+                    logger.exception("delClient failed for %s", uuid)
+                    return False
+
+        uuids = list(uuids)
+        try:
+            results = await asyncio.gather(*(delete(uuid) for uuid in uuids))
+        finally:
+            self.invalidate_inbound()
+        return dict(zip(uuids, results))
+
 
 def get_async_client() -> APIClient:
+    """
+    Создаёт новый клиент API.
+
+    В боте используется один экземпляр, созданный при старте и переданный
+    в хендлеры через ApiClientMiddleware. Фабрика нужна для шелла и скриптов.
+    """
     return APIClient(BASE_URL, VPN_USERNAME, VPN_PASSWORD, int(DEFAULT_INBOUND))
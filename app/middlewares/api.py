@@ -1,9 +1,10 @@
 from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
 from app.login_client import APIClient
 
 
-class ApiClientMiddleware:
+class ApiClientMiddleware(BaseMiddleware):
     def __init__(self, api_client: APIClient):
         self.api_client = api_client
 
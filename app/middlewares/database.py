@@ -1,17 +1,78 @@
 import logging
+import time
 from typing import Any, Awaitable, Callable
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject, Update
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from app.db.repository import UserRepository
+from app.db.repository import UNIT_OF_WORK, UserRepository
+from app.db.user_cache import UserCache, user_cache
 
 logger = logging.getLogger(__name__)
 
 
+class LazySession:
+    """
+    Proxy for AsyncSession that creates the session on first attribute access.
+
+    Updates whose handler never touches the DB skip the session entirely;
+    close() reports how long the real session lived. The session is a unit of
+    work: repositories only flush and commit() is called once per update.
+    Handlers that write commit themselves before replying, so the SQLite
+    write lock is not held while the reply waits in the send queue.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
+        self._session_maker = session_maker
+        self._session: AsyncSession | None = None
+        self._opened_at = 0.0
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    @property
+    def session(self) -> AsyncSession:
+        if self._session is None:
+            logger.debug("Opening a new database session")
+            self._session = self._session_maker(info={UNIT_OF_WORK: True})
+            self._opened_at = time.perf_counter()
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.session, name)
+
+    async def commit(self) -> None:
+        """
+        Commit the unit of work; rolls back instead if a flush already failed.
+        """
+        if self._session is None:
+            return
+        if not self._session.is_active:
+            logger.warning("Rolling back the database session after a failed flush")
+            await self._session.rollback()
+            return
+        await self._session.commit()
+
+    async def close(self) -> float | None:
+        """
+        Close the session if it was opened; returns its lifetime in seconds.
+        """
+        if self._session is None:
+            return None
+        logger.debug("Closing the database session")
+        await self._session.close()
+        self._session = None
+        return time.perf_counter() - self._opened_at
+
+
 class DataBaseSession(BaseMiddleware):
     def __init__(self, session_maker: async_sessionmaker[AsyncSession]):
         self.session_maker = session_maker
+        self.updates = 0
+        self.sessions = 0
+        self.total_lifetime = 0.0
+        self.max_lifetime = 0.0
 
     async def __call__(
         self,
@@ -19,21 +80,40 @@ class DataBaseSession(BaseMiddleware):
         event: TelegramObject,
         data: dict[str, Any],
     ):
-        logger.debug("Opening a new database session")
-        async with self.session_maker() as session:
-            data["session"] = session
-            try:
-                result = await handler(event, data)
-                logger.debug("Handler executed successfully")
-                return result
-            except Exception as e:
-                logger.error(f"Error during handler execution: {e}")
-                raise
-            finally:
-                logger.debug("Closing the database session")
+        session = LazySession(self.session_maker)
+        data["session"] = session
+        self.updates += 1
+        try:
+            result = await handler(event, data)
+            await session.commit()
+            logger.debug("Handler executed successfully")
+            return result
+        except Exception as e:
+            logger.error(f"Error during handler execution: {e}")
+            raise
+        finally:
+            lifetime = await session.close()
+            if lifetime is not None:
+                self.sessions += 1
+                self.total_lifetime += lifetime
+                self.max_lifetime = max(self.max_lifetime, lifetime)
+                logger.debug("Database session lived %.1f ms", lifetime * 1000)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "updates": self.updates,
+            "sessions": self.sessions,
+            "avg_lifetime_ms": (
+                self.total_lifetime / self.sessions * 1000 if self.sessions else 0.0
+            ),
+            "max_lifetime_ms": self.max_lifetime * 1000,
+        }
 
 
 class UserMiddleware(BaseMiddleware):
+    def __init__(self, cache: UserCache = user_cache):
+        self.cache = cache
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
@@ -48,7 +128,14 @@ class UserMiddleware(BaseMiddleware):
         ):
             chat_id = event.event.from_user.id
             session = data["session"]
-            user = await UserRepository(session=session).get_by_chat_id(chat_id)
+            found, snapshot = self.cache.get(chat_id)
+            if found:
+                # Own detached copy per update: no SELECT and no session opened.
+                user = snapshot and self.cache.copy(snapshot)
+            else:
+                generation = self.cache.generation
+                user = await UserRepository(session=session).get_by_chat_id(chat_id)
+                self.cache.put(chat_id, user, generation)
             data["user"] = user
         else:
             logger.warning("Event is not an Update or user data is missing")
@@ -0,0 +1,94 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from app.middlewares.utils import event_chat_key
+
+logger = logging.getLogger(__name__)
+
+
+class _ChatQueue:
+    __slots__ = ("lock", "pending")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.pending = 0
+
+
+class ChatOrderingMiddleware(BaseMiddleware):
+    """
+    Outer update middleware: updates of one chat run one at a time in arrival
+    order, different chats run in parallel on at most `workers` handlers.
+
+    An update first waits for its chat's FIFO lock and only then for a worker
+    slot, so a chat with a backlog of clicks never holds more than one slot.
+    Backpressure comes from the source: polling admits a bounded number of
+    updates (tasks_concurrency_limit), webhook requests are answered only
+    after handling, so Telegram's max_connections bounds them.
+    """
+
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._slots = asyncio.Semaphore(workers)
+        self._chats: dict[int, _ChatQueue] = {}
+        self.running = 0
+        self.waiting = 0
+        self.max_running = 0
+        self.max_waiting = 0
+        self.max_chat_backlog = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ):
+        key = event_chat_key(data)
+        if key is None:
+            return await self._run(handler, event, data)
+
+        queue = self._chats.get(key)
+        if queue is None:
+            queue = self._chats[key] = _ChatQueue()
+        queue.pending += 1
+        self.max_chat_backlog = max(self.max_chat_backlog, queue.pending)
+        try:
+            async with queue.lock:
+                return await self._run(handler, event, data)
+        finally:
+            queue.pending -= 1
+            if not queue.pending:
+                del self._chats[key]
+
+    async def _run(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ):
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            return await handler(event, data)
+        finally:
+            self.running -= 1
+            self._slots.release()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "waiting": self.waiting,
+            "chats": len(self._chats),
+            "max_running": self.max_running,
+            "max_waiting": self.max_waiting,
+            "max_chat_backlog": self.max_chat_backlog,
+        }
@@ -0,0 +1,280 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import logging
+import statistics
+import time
+from collections import deque
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Iterator
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import (
+    BaseRequestMiddleware,
+    NextRequestMiddlewareType,
+)
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import Response, SendChatAction, TelegramMethod
+from aiogram.methods.base import TelegramType
+
+from app.middlewares.throttling import Limit, TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class SendPriority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
+_priority: ContextVar[SendPriority] = ContextVar(
+    "send_priority", default=SendPriority.INTERACTIVE
+)
+
+
+@contextlib.contextmanager
+def bulk_sends() -> Iterator[None]:
+    """
+    Bot API calls made inside the block queue behind interactive replies.
+    """
+    token = _priority.set(SendPriority.BULK)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class _Job:
+    __slots__ = (
+        "make_request",
+        "bot",
+        "method",
+        "future",
+        "priority",
+        "queued_at",
+        "attempts",
+    )
+
+    def __init__(
+        self,
+        make_request: NextRequestMiddlewareType[Any],
+        bot: Bot,
+        method: TelegramMethod[Any],
+        priority: SendPriority,
+    ) -> None:
+        self.make_request = make_request
+        self.bot = bot
+        self.method = method
+        self.future: asyncio.Future[Response[Any]] = (
+            asyncio.get_running_loop().create_future()
+        )
+        self.priority = priority
+        self.queued_at = time.monotonic()
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("jobs", "bucket", "busy")
+
+    def __init__(self, burst: float, now: float) -> None:
+        self.jobs: deque[_Job] = deque()
+        self.bucket = TokenBucket(burst, now)
+        self.busy = False
+
+
+class SendScheduler(BaseRequestMiddleware):
+    """
+    Bot session middleware that paces outgoing messages to Bot API limits.
+
+    send*/edit*/copy*/forward* calls addressed to a chat are queued and sent
+    by one dispatcher task: at most global_rate per second overall and
+    chat_limit per chat, one request in flight per chat so the chat's order
+    is kept. Among chats that may send, interactive calls go before bulk
+    ones (see bulk_sends()). A 429 puts the call back at the head of its
+    chat and pauses all sending for retry_after seconds. Other requests
+    (getUpdates, answerCallbackQuery, ...) pass through untouched.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_limit: Limit,
+        max_retries: int = 3,
+        latency_window: int = 1000,
+    ):
+        self.global_interval = 1 / global_rate
+        self.chat_limit = chat_limit
+        self.max_retries = max_retries
+        self._chats: dict[int | str, _Chat] = {}
+        # (priority, seq, chat) of chats allowed to send now,
+        # (ready_at, seq, chat) of chats waiting for their bucket.
+        self._ready: list[tuple[int, int, int | str]] = []
+        self._waiting: list[tuple[float, int, int | str]] = []
+        self._seq = itertools.count()
+        self._next_send = 0.0
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._sends: set[asyncio.Task] = set()
+        self._sweep_at = 1024
+        self.depth = 0
+        self.max_depth = 0
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self._latencies: deque[float] = deque(maxlen=latency_window)
+
+    async def __call__(
+        self,
+        make_request: NextRequestMiddlewareType[TelegramType],
+        bot: Bot,
+        method: TelegramMethod[TelegramType],
+    ) -> Response[TelegramType]:
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not self._paced(method):
+            return await make_request(bot, method)
+
+        job = _Job(make_request, bot, method, _priority.get())
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) >= self._sweep_at:
+                self._sweep()
+            chat = self._chats[chat_id] = _Chat(self.chat_limit.burst, time.monotonic())
+        chat.jobs.append(job)
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if len(chat.jobs) == 1 and not chat.busy:
+            self._schedule(chat_id, chat)
+        return await job.future
+
+    @staticmethod
+    def _paced(method: TelegramMethod[Any]) -> bool:
+        name = type(method).__name__
+        return name.startswith(("Send", "Edit", "Copy", "Forward")) and not isinstance(
+            method, SendChatAction
+        )
+
+    def _schedule(self, chat_id: int | str, chat: _Chat) -> None:
+        """
+        Queue a chat with pending jobs as ready or waiting for its bucket.
+        """
+        now = time.monotonic()
+        chat.bucket.refill(self.chat_limit, now)
+        wait = chat.bucket.wait_time(self.chat_limit)
+        if wait:
+            heapq.heappush(self._waiting, (now + wait, next(self._seq), chat_id))
+        else:
+            priority = chat.jobs[0].priority
+            heapq.heappush(self._ready, (priority, next(self._seq), chat_id))
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="send_scheduler")
+
+    def _sweep(self) -> None:
+        """
+        Forget idle chats whose bucket has refilled: a new one is identical.
+        """
+        now = time.monotonic()
+        for chat_id, chat in list(self._chats.items()):
+            if chat.jobs or chat.busy:
+                continue
+            chat.bucket.refill(self.chat_limit, now)
+            if chat.bucket.tokens >= self.chat_limit.burst:
+                del self._chats[chat_id]
+        self._sweep_at = max(1024, 2 * len(self._chats))
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            while self._waiting and self._waiting[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._waiting)
+                self._schedule(chat_id, self._chats[chat_id])
+            if not self._ready or now < self._next_send:
+                delay = self._next_send - now if self._ready else None
+                if self._waiting:
+                    until_ready = self._waiting[0][0] - now
+                    delay = until_ready if delay is None else min(delay, until_ready)
+                if delay is None and not self.depth:
+                    # Nothing queued: the next __call__ restarts the task.
+                    return
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat.bucket.tokens -= 1
+            chat.busy = True
+            self._next_send = max(self._next_send, now) + self.global_interval
+            task = asyncio.create_task(self._send(chat_id, chat, chat.jobs.popleft()))
+            self._sends.add(task)
+            task.add_done_callback(self._sends.discard)
+
+    async def _send(self, chat_id: int | str, chat: _Chat, job: _Job) -> None:
+        requeued = False
+        try:
+            if job.future.cancelled():
+                return
+            response = await job.make_request(job.bot, job.method)
+        except TelegramRetryAfter as e:
+            if job.attempts >= self.max_retries:
+                self._fail(job, e)
+                return
+            job.attempts += 1
+            self.retried += 1
+            logger.warning(
+                "Flood wait %ss on %s to %s",
+                e.retry_after,
+                type(job.method).__name__,
+                chat_id,
+            )
+            self._next_send = max(self._next_send, time.monotonic() + e.retry_after)
+            # The chat's next token comes exactly when the pause is over.
+            chat.bucket.tokens = 1 - e.retry_after * self.chat_limit.rate
+            chat.jobs.appendleft(job)
+            requeued = True
+        except Exception as e:
+            self._fail(job, e)
+        else:
+            self.sent += 1
+            self._latencies.append(time.monotonic() - job.queued_at)
+            if not job.future.done():
+                job.future.set_result(response)
+        finally:
+            chat.busy = False
+            if not requeued:
+                self.depth -= 1
+            if chat.jobs:
+                self._schedule(chat_id, chat)
+
+    def _fail(self, job: _Job, error: Exception) -> None:
+        self.failed += 1
+        if not job.future.done():
+            job.future.set_exception(error)
+
+    async def close(self) -> None:
+        """
+        Stop the dispatcher task; calls still queued are cancelled.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        for chat in self._chats.values():
+            for job in chat.jobs:
+                job.future.cancel()
+
+    def stats(self) -> dict[str, float]:
+        latencies = sorted(self._latencies)
+        return {
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            "sent": self.sent,
+            "retried": self.retried,
+            "failed": self.failed,
+            "latency_p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+            "latency_p99_ms": (
+                latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+            ),
+        }
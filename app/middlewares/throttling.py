@@ -0,0 +1,176 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Mapping, NamedTuple
+from aiogram import BaseMiddleware
+from aiogram.exceptions import TelegramAPIError
+from aiogram.types import TelegramObject, Update
+
+from app.middlewares.utils import event_chat_key
+
+logger = logging.getLogger(__name__)
+
+
+class Limit(NamedTuple):
+    rate: float  # tokens per second
+    burst: float  # bucket capacity
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float) -> None:
+        self.tokens = burst
+        self.updated = now
+
+    def refill(self, limit: Limit, now: float) -> None:
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+
+    def wait_time(self, limit: Limit) -> float:
+        """
+        Seconds until one token is available; 0 if it is available now.
+        """
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / limit.rate if limit.rate > 0 else math.inf
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Token buckets per chat and global, with separate limits for expensive
+    callback actions (keyed by "<prefix>:<action>" of the packed callback
+    data). Every update spends a token from the chat and global buckets;
+    an expensive action also spends from its own chat and global buckets.
+    Tokens are only taken when all buckets have one, so a rejected update
+    costs nothing.
+
+    Buckets live in an OrderedDict ordered by last use. A bucket idle for
+    idle_ttl would be full again, so it is dropped from the front of the
+    dict on the next update: checks and eviction are O(1) amortized.
+    """
+
+    def __init__(
+        self,
+        chat_limit: Limit,
+        global_limit: Limit,
+        action_limits: Mapping[str, tuple[Limit, Limit]] | None = None,
+        idle_ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.chat_limit = chat_limit
+        self.global_limit = global_limit
+        # action -> (per-chat limit, global limit)
+        self.action_limits = dict(action_limits or {})
+        limits = [chat_limit, *(chat for chat, _ in self.action_limits.values())]
+        if idle_ttl is None:
+            idle_ttl = max(
+                (limit.burst / limit.rate for limit in limits if limit.rate > 0),
+                default=3600.0,
+            )
+        self.idle_ttl = idle_ttl
+        self.clock = clock
+        self._buckets: OrderedDict[tuple[int, str], TokenBucket] = OrderedDict()
+        self._global: dict[str, TokenBucket] = {}
+        self.allowed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ):
+        chat_id = event_chat_key(data)
+        if chat_id is None:
+            return await handler(event, data)
+
+        action = self._action(event)
+        wait = self.take(chat_id, action)
+        if not wait:
+            self.allowed += 1
+            return await handler(event, data)
+
+        self.throttled += 1
+        logger.info(
+            "Throttled update from %s (action=%s, retry in %.1fs)",
+            chat_id,
+            action,
+            wait,
+        )
+        if isinstance(event, Update) and event.callback_query:
+            try:
+                await event.callback_query.answer(
+                    f"⏳ Слишком часто, попробуйте через {math.ceil(wait)} с"
+                )
+            except TelegramAPIError as e:
+                logger.warning("Failed to answer throttled callback: %s", e)
+        return None
+
+    def take(self, chat_id: int, action: str | None) -> float:
+        """
+        Spend one token from every bucket that applies to the update.
+        Returns 0 on success, otherwise seconds until it would succeed.
+        """
+        now = self.clock()
+        self._evict(now)
+        checks = [
+            (self._chat_bucket(chat_id, "", now), self.chat_limit),
+            (self._global_bucket("", now), self.global_limit),
+        ]
+        if action in self.action_limits:
+            chat_limit, global_limit = self.action_limits[action]
+            checks.append((self._chat_bucket(chat_id, action, now), chat_limit))
+            checks.append((self._global_bucket(action, now), global_limit))
+
+        wait = 0.0
+        for bucket, limit in checks:
+            bucket.refill(limit, now)
+            wait = max(wait, bucket.wait_time(limit))
+        if wait:
+            return wait
+        for bucket, _ in checks:
+            bucket.tokens -= 1
+        return 0.0
+
+    def _chat_bucket(self, chat_id: int, action: str, now: float) -> TokenBucket:
+        key = (chat_id, action)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            limit = self.action_limits[action][0] if action else self.chat_limit
+            bucket = self._buckets[key] = TokenBucket(limit.burst, now)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _global_bucket(self, action: str, now: float) -> TokenBucket:
+        bucket = self._global.get(action)
+        if bucket is None:
+            limit = self.action_limits[action][1] if action else self.global_limit
+            bucket = self._global[action] = TokenBucket(limit.burst, now)
+        return bucket
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            key, bucket = next(iter(self._buckets.items()))
+            if now - bucket.updated < self.idle_ttl:
+                break
+            del self._buckets[key]
+            self.evicted += 1
+
+    @staticmethod
+    def _action(event: TelegramObject) -> str | None:
+        if isinstance(event, Update) and event.callback_query:
+            prefix, _, rest = (event.callback_query.data or "").partition(":")
+            return f"{prefix}:{rest.partition(':')[0]}"
+        return None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "allowed": self.allowed,
+            "throttled": self.throttled,
+            "buckets": len(self._buckets),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,14 @@
+from typing import Any
+from aiogram.types import Chat, User
+
+
+def event_chat_key(data: dict[str, Any]) -> int | None:
+    """
+    Chat id of the update, or the sender id for updates without a chat
+    (inline queries); None for updates with neither.
+    """
+    chat: Chat | None = data.get("event_chat")
+    if chat is not None:
+        return chat.id
+    user: User | None = data.get("event_from_user")
+    return user.id if user is not None else None
@@ -1,6 +1,5 @@
 from logging.config import fileConfig
-import logging
-from app.dependencies.logging_settings import logging_config
+from app.dependencies.logging_settings import setup_logging
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
@@ -9,7 +8,7 @@ from alembic import context
 import app.db.models as models
 
 # Apply custom logging configuration
-logging.config.dictConfig(logging_config)
+setup_logging()
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -1,6 +1,88 @@
-import json
-from typing import Any
-from pydantic import BaseModel, field_validator
+from functools import cached_property
+from typing import (
+    Any,
+    Iterable,
+    Iterator,
+    Mapping,
+    Sequence,
+    TypeVar,
+    overload,
+)
+from pydantic import BaseModel, TypeAdapter, field_validator
+from pydantic_core import from_json
+
+
+# Rust JSON decoder from pydantic-core, noticeably faster than json.loads.
+json_loads = from_json
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class LazyModelList(Sequence[M]):
+    """
+    Список моделей поверх сырых dict из ответа панели.
+
+    Модель валидируется только при обращении к элементу и запоминается,
+    так что поиск одного клиента не требует разбора всего inbound.
+    """
+
+    def __init__(self, model: type[M], raw: list[dict[str, Any]]) -> None:
+        self.model = model
+        self.raw = raw
+        self._items: list[M | None] = [None] * len(raw)
+
+    def _get(self, index: int) -> M:
+        item = self._items[index]
+        if item is None:
+            item = self.model.model_validate(self.raw[index])
+            self._items[index] = item
+        return item
+
+    @overload
+    def __getitem__(self, index: int) -> M: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[M]: ...
+
+    def __getitem__(self, index: int | slice) -> M | list[M]:
+        if isinstance(index, slice):
+            return [self._get(i) for i in range(*index.indices(len(self.raw)))]
+        return self._get(range(len(self.raw))[index])
+
+    def __len__(self) -> int:
+        return len(self.raw)
+
+    def __iter__(self) -> Iterator[M]:
+        for i in range(len(self.raw)):
+            yield self._get(i)
+
+    def __repr__(self) -> str:
+        return f"<LazyModelList[{self.model.__name__}] len={len(self.raw)}>"
+
+
+class ModelIndex(Mapping[str, M]):
+    """
+    Индекс key -> модель, хранящий только позиции в исходном списке.
+    """
+
+    def __init__(self, items: Sequence[M], field: str) -> None:
+        self.models = items
+        if isinstance(items, LazyModelList):
+            self.positions = {raw[field]: i for i, raw in enumerate(items.raw)}
+        else:
+            self.positions = {getattr(item, field): i for i, item in enumerate(items)}
+
+    def __getitem__(self, key: str) -> M:
+        return self.models[self.positions[key]]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.positions)
+
+    def __len__(self) -> int:
+        return len(self.positions)
 
 
 class SClient(BaseModel):
@@ -107,27 +189,81 @@ class SInbound(BaseModel):
     @field_validator("settings", mode="before")
     def parse_settings(cls, v):
         if isinstance(v, str):
-            return json.loads(v)
+            return json_loads(v)
         return v
 
     @field_validator("streamSettings", mode="before")
     def parse_stream_settings(cls, v):
         if isinstance(v, str):
-            return json.loads(v)
+            return json_loads(v)
         return v
 
     @field_validator("sniffing", mode="before")
     def parse_sniffing(cls, v):
         if isinstance(v, str):
-            return json.loads(v)
+            return json_loads(v)
         return v
 
     @field_validator("allocate", mode="before")
     def parse_allocate(cls, v):
         if isinstance(v, str):
-            return json.loads(v)
+            return json_loads(v)
         return v
 
+    # Индексы строятся один раз на снимок inbound при первом обращении.
+    @cached_property
+    def clients_by_id(self) -> Mapping[str, SClient]:
+        return ModelIndex(self.settings.clients, "id")
+
+    @cached_property
+    def clients_by_email(self) -> Mapping[str, SClient]:
+        return ModelIndex(self.settings.clients, "email")
+
+    @cached_property
+    def stats_by_email(self) -> Mapping[str, ClientStats]:
+        return ModelIndex(self.clientStats, "email")
+
+    @cached_property
+    def disabled_client_ids(self) -> frozenset[str]:
+        """
+        uuid of clients switched off in the panel, read from raw dicts when lazy.
+        """
+        clients = self.settings.clients
+        if isinstance(clients, LazyModelList):
+            return frozenset(raw["id"] for raw in clients.raw if not raw["enable"])
+        return frozenset(client.id for client in clients if not client.enable)
+
+    def get_client(
+        self, uuid: str | None = None, email: str | None = None
+    ) -> SClient | None:
+        """
+        Find a client by uuid or email.
+        """
+        client = None
+        if uuid:
+            client = self.clients_by_id.get(uuid)
+        if client is None and email:
+            client = self.clients_by_email.get(email)
+        return client
+
+    def get_clients(
+        self,
+        uuids: Iterable[str] = (),
+        emails: Iterable[str] = (),
+    ) -> dict[str, SClient]:
+        """
+        Resolve many clients at once. Keys are the requested uuids/emails,
+        missing clients are left out.
+        """
+        found: dict[str, SClient] = {}
+        for uuid in uuids:
+            if client := self.clients_by_id.get(uuid):
+                found[uuid] = client
+        for email in emails:
+            if client := self.clients_by_email.get(email):
+                found[email] = client
+        return found
+
 
 class Response(BaseModel):
     success: bool
@@ -135,6 +271,78 @@ class Response(BaseModel):
     obj: list[SInbound]
 
 
+_stream_settings_adapter = TypeAdapter(SStreamSettings)
+_sniffing_adapter = TypeAdapter(Sniffing)
+_allocate_adapter = TypeAdapter(Allocate)
+
+
+_LAZY_INBOUND_FIELDS = frozenset(
+    ("clientStats", "settings", "streamSettings", "sniffing", "allocate")
+)
+
+
+def _validate_nested(adapter: TypeAdapter, value: Any) -> Any:
+    if isinstance(value, (str, bytes)):
+        return adapter.validate_json(value)
+    return adapter.validate_python(value)
+
+
+def parse_inbound_lazy(raw: dict[str, Any]) -> SInbound:
+    """
+    Быстрый разбор inbound без полной валидации.
+
+    Вложенные настройки валидируются напрямую из JSON-строк, а клиенты и
+    статистика оборачиваются в LazyModelList и валидируются по одному при
+    обращении. Поля верхнего уровня не проверяются (model_construct).
+    """
+    settings = raw["settings"]
+    if isinstance(settings, (str, bytes)):
+        settings = json_loads(settings)
+    fields = {
+        name: raw[name]
+        for name in SInbound.model_fields
+        if name not in _LAZY_INBOUND_FIELDS and name in raw
+    }
+    return SInbound.model_construct(
+        **fields,
+        clientStats=LazyModelList(ClientStats, raw.get("clientStats") or []),
+        settings=Settings.model_construct(
+            clients=LazyModelList(SClient, settings.get("clients") or []),
+            decryption=settings.get("decryption", ""),
+            fallbacks=settings.get("fallbacks") or [],
+        ),
+        streamSettings=_validate_nested(
+            _stream_settings_adapter, raw["streamSettings"]
+        ),
+        sniffing=_validate_nested(_sniffing_adapter, raw["sniffing"]),
+        allocate=_validate_nested(_allocate_adapter, raw["allocate"]),
+    )
+
+
+def parse_inbound_list(
+    payload: dict[str, Any], validate: bool = False
+) -> list[SInbound]:
+    """
+    Разбирает ответ panel/api/inbounds/list.
+
+    validate=True — полная валидация pydantic (медленно, для отладки),
+    иначе быстрый ленивый разбор через parse_inbound_lazy.
+    """
+    if validate:
+        return Response.model_validate(payload).obj
+    if not payload.get("success"):
+        raise ValueError(f"Panel returned an error: {payload.get('msg')!r}")
+    return [parse_inbound_lazy(raw) for raw in payload.get("obj") or []]
+
+
+class SCreatedConnection(BaseModel):
+    email: str
+    uuid: str
+    sub_id: str
+    expiry_time: int
+    link: str | None
+
+
 class Connection(BaseModel):
     inbound: int
     email: str
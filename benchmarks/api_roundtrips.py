@@ -0,0 +1,127 @@
+"""
+Сравнение числа обращений к панели на один хендлер.
+
+before — прежнее поведение: на каждый вызов метода APIClient открывается
+новая сессия aiohttp и выполняется логин.
+after — один общий APIClient с пулом keep-alive соединений.
+
+Запуск: python -m benchmarks.api_roundtrips [--clients N] [--iterations K]
+"""
+
+import argparse
+import asyncio
+import statistics
+from typing import Any, Awaitable, Callable
+
+from app.login_client import APIClient
+from benchmarks.fake_panel import FakePanel, Timer
+
+INBOUND_ID = 1
+
+Step = Callable[[APIClient, dict[str, Any]], Awaitable[None]]
+
+
+async def _add(client: APIClient, ctx: dict[str, Any]) -> None:
+    ctx["email"] = await client.add_connection(
+        "bench", tg_id=1, limit_ip=3, expiry_time_days=3
+    )
+
+
+async def _inbound(client: APIClient, ctx: dict[str, Any]) -> None:
+    ctx["inbound"] = await client.get_inbound()
+
+
+async def _connection_by_email(client: APIClient, ctx: dict[str, Any]) -> None:
+    connection = await client.get_connection(ctx["inbound"], email=ctx["email"])
+    assert connection is not None
+    ctx["uuid"] = connection.id
+
+
+async def _connection_by_uuid(client: APIClient, ctx: dict[str, Any]) -> None:
+    assert await client.get_connection(uuid=ctx["uuid"]) is not None
+
+
+async def _stats(client: APIClient, ctx: dict[str, Any]) -> None:
+    assert ctx["email"] in await client.get_stats()
+
+
+async def _delete(client: APIClient, ctx: dict[str, Any]) -> None:
+    assert await client.delete_connection(ctx["uuid"])
+
+
+# Последовательности вызовов APIClient в хендлерах бота.
+FLOWS: dict[str, list[Step]] = {
+    "add_connection": [_add, _inbound, _connection_by_email],
+    "send_connection_stats": [_connection_by_uuid, _stats],
+    "delete_connection": [_connection_by_uuid, _delete],
+}
+
+
+async def run_mode(
+    panel: FakePanel, mode: str, iterations: int
+) -> dict[str, dict[str, float]]:
+    shared = APIClient(panel.base_url, "admin", "admin", INBOUND_ID)
+
+    async def run_step(step: Step, ctx: dict[str, Any]) -> None:
+        if mode == "after":
+            await step(shared, ctx)
+            return
+        async with APIClient(panel.base_url, "admin", "admin", INBOUND_ID) as client:
+            await step(client, ctx)
+
+    results: dict[str, dict[str, float]] = {}
+    # Подключения, которые смотрят и удаляют остальные хендлеры.
+    contexts: list[dict[str, Any]] = []
+    for _ in range(iterations):
+        ctx: dict[str, Any] = {}
+        for step in FLOWS["add_connection"]:
+            await run_step(step, ctx)
+        contexts.append(ctx)
+
+    for name, steps in FLOWS.items():
+        panel.reset_counters()
+        timings = []
+        for i in range(iterations):
+            ctx = contexts[i] if name != "add_connection" else {}
+            with Timer() as timer:
+                for step in steps:
+                    await run_step(step, ctx)
+            timings.append(timer.elapsed)
+        results[name] = {
+            "requests": sum(panel.requests.values()) / iterations,
+            "logins": panel.requests["login"] / iterations,
+            "connections": len(panel.connections) / iterations,
+            "ms": statistics.mean(timings) * 1000,
+        }
+    await shared.close()
+    return results
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    async with FakePanel({INBOUND_ID: args.clients}, latency=args.latency) as panel:
+        report = {
+            mode: await run_mode(panel, mode, args.iterations)
+            for mode in ("before", "after")
+        }
+
+    print(
+        f"{'handler':<24}{'mode':<8}{'requests':>10}{'logins':>8}"
+        f"{'tcp conns':>11}{'ms':>10}"
+    )
+    for name in FLOWS:
+        for mode, results in report.items():
+            row = results[name]
+            print(
+                f"{name:<24}{mode:<8}{row['requests']:>10.2f}{row['logins']:>8.2f}"
+                f"{row['connections']:>11.2f}{row['ms']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
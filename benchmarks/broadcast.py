@@ -0,0 +1,189 @@
+"""
+Рассылка на --users пользователей: память, скорость и продолжение после
+перезапуска.
+
+Bot получает SendScheduler, как в app.__main__, а за ним заглушку вместо
+HTTP: каждый --blocked-every-й пользователь «заблокировал бота». Лимит
+отправки поднят до --rate, чтобы измерять сам конвейер, а не лимиты Telegram.
+
+Режимы:
+
+- naive: все пользователи загружаются одним запросом и отправляются одним
+  gather;
+- streaming: Broadcaster из app.jobs.broadcast. Задача останавливается
+  после половины получателей и запускается заново новым Broadcaster, как
+  после перезапуска бота.
+
+Печатаются время, пик памяти Python (tracemalloc), счётчики рассылки и
+число повторных отправок после перезапуска (не больше --batch-size).
+
+Запуск: python -m benchmarks.broadcast [--users 100000] [--batch-size 100]
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError
+from aiogram.methods import SendMessage
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import get_engine
+from app.db.models import Base, Broadcast
+from app.db.repository import BroadcastRepository, UserRepository
+from app.jobs.broadcast import Broadcaster
+from app.middlewares.send_scheduler import SendScheduler
+from app.middlewares.throttling import Limit
+from benchmarks.webhook_load import TOKEN
+
+AUTHOR = 1
+
+
+class FakeSend(BaseRequestMiddleware):
+    """
+    Последний middleware сессии: отвечает вместо Bot API.
+    """
+
+    def __init__(self, blocked_every: int) -> None:
+        self.blocked_every = blocked_every
+        self.sent: Counter[int] = Counter()
+
+    async def __call__(self, make_request: Any, bot: Bot, method: Any) -> Any:
+        await asyncio.sleep(0)
+        if isinstance(method, SendMessage) and method.chat_id != AUTHOR:
+            chat_id = int(method.chat_id)
+            self.sent[chat_id] += 1
+            if chat_id % self.blocked_every == 0:
+                raise TelegramForbiddenError(
+                    method=method, message="Forbidden: bot was blocked by the user"
+                )
+        return True
+
+
+def make_bot(args: argparse.Namespace, fake: FakeSend) -> tuple[Bot, SendScheduler]:
+    bot = Bot(TOKEN)
+    scheduler = SendScheduler(args.rate, Limit(args.rate, args.rate))
+    bot.session.middleware(scheduler)
+    bot.session.middleware(fake)
+    return bot, scheduler
+
+
+async def run_naive(
+    session_maker: async_sessionmaker[AsyncSession], bot: Bot
+) -> Counter[str]:
+    async with session_maker() as session:
+        users = await UserRepository(session).get_all()
+
+    async def send(chat_id: int) -> str:
+        try:
+            await bot.send_message(chat_id, "bench")
+        except TelegramForbiddenError:
+            return "blocked"
+        except TelegramAPIError:
+            return "failed"
+        return "delivered"
+
+    return Counter(await asyncio.gather(*(send(user.chat_id) for user in users)))
+
+
+async def load(
+    session_maker: async_sessionmaker[AsyncSession], broadcast_id: int
+) -> Broadcast:
+    async with session_maker() as session:
+        broadcast = await BroadcastRepository(session).get_by_id(broadcast_id)
+    assert broadcast is not None
+    return broadcast
+
+
+async def run_streaming(
+    args: argparse.Namespace,
+    session_maker: async_sessionmaker[AsyncSession],
+    bot: Bot,
+) -> Broadcast:
+    broadcaster = Broadcaster(session_maker, bot, batch_size=args.batch_size)
+    broadcast = await broadcaster.start("bench", AUTHOR)
+    task = asyncio.create_task(broadcaster.run())
+    while (await load(session_maker, broadcast.id)).last_user_id < args.users // 2:
+        await asyncio.sleep(0.01)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    # «Перезапуск»: новый Broadcaster читает незавершённую рассылку из БД.
+    broadcaster = Broadcaster(session_maker, bot, batch_size=args.batch_size)
+    task = asyncio.create_task(broadcaster.run())
+    while (broadcast := await load(session_maker, broadcast.id)).finished_at is None:
+        await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return broadcast
+
+
+async def run(args: argparse.Namespace) -> None:
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = get_engine(db_path)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_maker = async_sessionmaker(engine, expire_on_commit=False)
+        async with session_maker() as session:
+            await UserRepository(session).create_many(
+                [
+                    {"chat_id": 1000 + i, "username": f"u{i}", "first_name": "b"}
+                    for i in range(args.users)
+                ]
+            )
+        print(f"users={args.users} batch={args.batch_size} rate={args.rate:.0f}/s")
+
+        for mode in ("naive", "streaming"):
+            fake = FakeSend(args.blocked_every)
+            bot, scheduler = make_bot(args, fake)
+            tracemalloc.start()
+            started = time.perf_counter()
+            if mode == "naive":
+                counts = await run_naive(session_maker, bot)
+                summary = (
+                    f"delivered={counts['delivered']} blocked={counts['blocked']} "
+                    f"failed={counts['failed']}"
+                )
+            else:
+                broadcast = await run_streaming(args, session_maker, bot)
+                summary = (
+                    f"delivered={broadcast.delivered} blocked={broadcast.blocked} "
+                    f"failed={broadcast.failed}"
+                )
+            elapsed = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            await scheduler.close()
+            await bot.session.close()
+            resent = sum(count - 1 for count in fake.sent.values())
+            print(
+                f"{mode:<10} {elapsed:>6.1f}s  {args.users / elapsed:>7.0f} msg/s  "
+                f"peak={peak / 2**20:>6.1f} MiB  {summary} resent={resent}"
+            )
+    finally:
+        await engine.dispose()
+        for suffix in ("", "-wal", "-shm", "-journal"):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=100_000.0)
+    parser.add_argument("--blocked-every", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
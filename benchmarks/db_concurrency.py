@@ -0,0 +1,249 @@
+"""
+Бенчмарк SQLite под одновременной нагрузкой хендлеров: старый профиль движка
+против профиля из app.db.config.get_engine.
+
+Старый профиль: rollback journal, synchronous=FULL, пул по умолчанию, отчёты
+на том же движке. Новый: WAL, synchronous=NORMAL, mmap, cache_size,
+busy_timeout, небольшой пул без overflow и отдельный read-only движок для
+отчётов. Писатели создают подключения (как add_connection), читатели ищут
+пользователя и его подключения (как UserMiddleware и conlist), отчёты
+считают агрегаты по всей таблице. Каждый воркер работает с фиксированной
+частотой; для каждого вида операций печатаются достигнутая частота, p50/p99
+задержки и число ошибок "database is locked".
+
+Запуск: python -m benchmarks.db_concurrency [--writers 10] [--readers 40] [--duration 10]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from app.db.config import get_engine
+from app.db.models import Base, Connection, User
+from app.db.repository import ConnectionRepository, UserRepository
+
+
+@dataclass
+class Stats:
+    timings: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+
+def seed(db_path: str, users: int, connections: int) -> None:
+    engine = create_engine(f"sqlite:///{db_path}")
+    Base.metadata.create_all(engine)
+    now = datetime.datetime.now(datetime.UTC)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {"username": f"user{i}", "first_name": "bench", "chat_id": i}
+                for i in range(1, users + 1)
+            ],
+        )
+        conn.execute(
+            insert(Connection),
+            [
+                {
+                    "inbound": 1,
+                    "email": f"seed-{i}",
+                    "connection_url": "vless://bench",
+                    "created_at": now,
+                    "expired_at": now,
+                    "uuid": f"{i:032x}",
+                    "exists_in_api": True,
+                    "enabled": True,
+                    "total_gb": 0.0,
+                    "host": "bench",
+                    "user_id": i % users + 1,
+                }
+                for i in range(connections)
+            ],
+        )
+    engine.dispose()
+
+
+def baseline_engine(db_path: str) -> AsyncEngine:
+    """
+    Движок в том виде, в каком он был до профиля (без echo).
+    """
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=DELETE")
+        cursor.close()
+
+    return engine
+
+
+async def _loop(
+    name: str,
+    operation: Callable[[random.Random], Awaitable[object]],
+    rate: float,
+    deadline: float,
+    stats: Stats,
+    seed_value: int,
+) -> None:
+    """
+    Открытая нагрузка: операция запускается rate раз в секунду, а задержка
+    считается от запланированного момента, чтобы учесть ожидание в очереди.
+    """
+    rng = random.Random(seed_value)
+    interval = 1 / rate
+    started = time.perf_counter() + rng.random() * interval
+    while started < deadline:
+        await asyncio.sleep(max(started - time.perf_counter(), 0))
+        try:
+            await operation(rng)
+        except OperationalError:
+            stats.errors[name] += 1
+        else:
+            stats.timings[name].append((time.perf_counter() - started) * 1000)
+        started = max(started + interval, time.perf_counter())
+
+
+async def run_profile(
+    engine: AsyncEngine,
+    report_engine: AsyncEngine,
+    users: int,
+    writers: int,
+    readers: int,
+    reporters: int,
+    rate: float,
+    duration: float,
+) -> Stats:
+    session_maker = async_sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+    report_maker = async_sessionmaker(
+        report_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    stats = Stats()
+    now = datetime.datetime.now(datetime.UTC)
+
+    async def write(rng: random.Random) -> None:
+        async with session_maker() as session:
+            await ConnectionRepository(session).create(
+                inbound=1,
+                email=f"bench-{rng.getrandbits(64):x}",
+                connection_url="vless://bench",
+                created_at=now,
+                expired_at=now,
+                uuid=f"{rng.getrandbits(128):032x}",
+                user_id=rng.randrange(1, users + 1),
+            )
+
+    async def read(rng: random.Random) -> None:
+        async with session_maker() as session:
+            user = await UserRepository(session).get_by_chat_id(
+                rng.randrange(1, users + 1)
+            )
+            if user is not None:
+                await ConnectionRepository(session).get_by_user_id(user.id)
+
+    async def report(rng: random.Random) -> None:
+        async with report_maker() as session:
+            await session.execute(
+                select(Connection.user_id, func.count())
+                .group_by(Connection.user_id)
+                .order_by(func.count().desc())
+                .limit(10)
+            )
+
+    deadline = time.perf_counter() + duration
+    workers = (
+        [("write", write)] * writers
+        + [("read", read)] * readers
+        + [("report", report)] * reporters
+    )
+    await asyncio.gather(
+        *(
+            _loop(name, operation, rate, deadline, stats, i)
+            for i, (name, operation) in enumerate(workers)
+        )
+    )
+    await engine.dispose()
+    await report_engine.dispose()
+    return stats
+
+
+def print_stats(title: str, stats: Stats, duration: float) -> None:
+    print(title)
+    for name in ("write", "read", "report"):
+        timings = sorted(stats.timings.get(name, []))
+        if not timings:
+            print(f"  {name:<7} no completed operations, errors={stats.errors[name]}")
+            continue
+        p50 = statistics.median(timings)
+        p99 = timings[int(len(timings) * 0.99)]
+        print(
+            f"  {name:<7} {len(timings) / duration:>8.1f} ops/s  "
+            f"p50={p50:>7.2f}ms  p99={p99:>8.2f}ms  errors={stats.errors[name]}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    for title in ("baseline", "tuned"):
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        try:
+            seed(db_path, args.users, args.connections)
+            if title == "baseline":
+                engine = baseline_engine(db_path)
+                report_engine = engine
+            else:
+                engine = get_engine(db_path)
+                report_engine = get_engine(db_path, read_only=True)
+            stats = await run_profile(
+                engine,
+                report_engine,
+                args.users,
+                args.writers,
+                args.readers,
+                args.reporters,
+                args.rate,
+                args.duration,
+            )
+            print_stats(title, stats, args.duration)
+        finally:
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--connections", type=int, default=100_000)
+    parser.add_argument("--writers", type=int, default=10)
+    parser.add_argument("--readers", type=int, default=40)
+    parser.add_argument("--reporters", type=int, default=2)
+    parser.add_argument(
+        "--rate", type=float, default=5.0, help="операций в секунду на воркер"
+    )
+    parser.add_argument("--duration", type=float, default=10.0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
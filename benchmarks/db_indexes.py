@@ -0,0 +1,162 @@
+"""
+Бенчмарк запросов репозиториев к SQLite без индексов и с индексами.
+
+Наполняет временную БД пользователями и подключениями, удаляет индексы из
+схемы моделей и замеряет горячие запросы (поиск пользователя по chat_id на
+каждом апдейте, подключения по email/uuid/user_id). Затем создаёт индексы
+из метаданных моделей, как это делает миграция, и повторяет замеры.
+
+Запуск: python -m benchmarks.db_indexes [--connections 1000000] [--users 100000]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import Engine, Index, create_engine, insert
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, Connection, User
+from app.db.repository import ConnectionRepository, UserRepository
+
+SEED_CHUNK = 50_000
+
+
+def seed(engine: Engine, users: int, connections: int) -> None:
+    now = datetime.datetime.now(datetime.UTC)
+    with engine.begin() as conn:
+        conn.execute(
+            insert(User),
+            [
+                {"username": f"user{i}", "first_name": "bench", "chat_id": i}
+                for i in range(1, users + 1)
+            ],
+        )
+        for start in range(0, connections, SEED_CHUNK):
+            conn.execute(
+                insert(Connection),
+                [
+                    {
+                        "inbound": 1,
+                        "email": f"user-{i:010d}",
+                        "connection_url": "vless://bench",
+                        "created_at": now,
+                        "expired_at": now,
+                        "uuid": f"{i:032x}",
+                        "exists_in_api": i % 4 != 0,
+                        "enabled": True,
+                        "total_gb": 0.0,
+                        "host": "bench",
+                        "user_id": i % users + 1,
+                    }
+                    for i in range(start, min(start + SEED_CHUNK, connections))
+                ],
+            )
+
+
+def model_indexes() -> list[Index]:
+    return [index for table in Base.metadata.sorted_tables for index in table.indexes]
+
+
+async def measure(
+    query: Callable[[int], Awaitable[object]], keys: list[int]
+) -> tuple[float, float]:
+    """
+    Среднее и p99 задержки запроса в миллисекундах.
+    """
+    timings = []
+    for key in keys:
+        started = time.perf_counter()
+        await query(key)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.fmean(timings), timings[int(len(timings) * 0.99)]
+
+
+async def run_queries(
+    db_path: str, users: int, connections: int, repeat: int
+) -> dict[str, tuple[float, float]]:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{db_path}")
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    rng = random.Random(0)
+    results: dict[str, tuple[float, float]] = {}
+    async with session_maker() as session:
+        users_repo = UserRepository(session)
+        connections_repo = ConnectionRepository(session)
+        queries: dict[str, tuple[Callable[[int], Awaitable[object]], int]] = {
+            "user by chat_id": (users_repo.get_by_chat_id, users),
+            "connection by email": (
+                lambda i: connections_repo.get_by_email(f"user-{i:010d}"),
+                connections,
+            ),
+            "connection by uuid": (
+                lambda i: connections_repo.filter_by(uuid=f"{i:032x}"),
+                connections,
+            ),
+            "connections of user": (
+                lambda i: connections_repo.get_by_user_id(i),
+                users,
+            ),
+        }
+        for name, (query, upper) in queries.items():
+            keys = [rng.randrange(1, upper) for _ in range(repeat)]
+            results[name] = await measure(query, keys)
+            session.expunge_all()
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--connections", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    fd, db_path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    engine = create_engine(f"sqlite:///{db_path}")
+    try:
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            for index in model_indexes():
+                index.drop(conn)
+
+        started = time.perf_counter()
+        seed(engine, args.users, args.connections)
+        print(
+            f"seeded {args.users} users, {args.connections} connections "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        before = asyncio.run(
+            run_queries(db_path, args.users, args.connections, args.repeat)
+        )
+
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            for index in model_indexes():
+                index.create(conn)
+        print(f"indexes built in {time.perf_counter() - started:.1f}s")
+        after = asyncio.run(
+            run_queries(db_path, args.users, args.connections, args.repeat)
+        )
+
+        print(f"{'query':<22} {'before ms (avg/p99)':>22} {'after ms (avg/p99)':>22}")
+        for name, (avg, p99) in before.items():
+            new_avg, new_p99 = after[name]
+            print(
+                f"{name:<22} {avg:>12.3f} / {p99:<8.3f} {new_avg:>12.3f} / {new_p99:<8.3f}"
+            )
+    finally:
+        engine.dispose()
+        os.remove(db_path)
+
+
+if __name__ == "__main__":
+    main()
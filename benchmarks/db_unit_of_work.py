@@ -0,0 +1,124 @@
+"""
+Бенчмарк записи из хендлеров: commit + refresh на каждую операцию
+репозитория против unit of work (только flush и один commit на апдейт).
+
+Повторяет работу с БД двух сценариев:
+
+- регистрация: поиск пользователя по chat_id и создание User;
+- создание подключения: поиск пользователя и создание Connection.
+
+Для каждого режима печатаются p50/p99 задержки сценария и число SQL
+запросов на один сценарий. Профиль движка берётся из app.db.config
+(SQLITE_SYNCHRONOUS=FULL показывает цену лишних fsync).
+
+Запуск: python -m benchmarks.db_unit_of_work [--repeat 2000]
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import statistics
+import tempfile
+import time
+from typing import Awaitable, Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.db.config import get_engine
+from app.db.models import Base
+from app.db.repository import UNIT_OF_WORK, ConnectionRepository, UserRepository
+
+
+async def register(session: AsyncSession, chat_id: int, refresh: bool) -> None:
+    users = UserRepository(session)
+    if await users.get_by_chat_id(chat_id) is None:
+        await users.create(
+            refresh=refresh, chat_id=chat_id, username=f"user{chat_id}", first_name="b"
+        )
+
+
+async def add_connection(session: AsyncSession, chat_id: int, refresh: bool) -> None:
+    user = await UserRepository(session).get_by_chat_id(chat_id)
+    now = datetime.datetime.now(datetime.UTC)
+    await ConnectionRepository(session).create(
+        refresh=refresh,
+        inbound=1,
+        email=f"bench-{chat_id}-{time.perf_counter_ns()}",
+        connection_url="vless://bench",
+        created_at=now,
+        expired_at=now + datetime.timedelta(days=3),
+        uuid=f"{time.perf_counter_ns():032x}",
+        user=user,
+    )
+
+
+async def run_flow(
+    session_maker: async_sessionmaker[AsyncSession],
+    flow: Callable[[AsyncSession, int, bool], Awaitable[None]],
+    chat_ids: range,
+    unit_of_work: bool,
+) -> list[float]:
+    timings = []
+    for chat_id in chat_ids:
+        started = time.perf_counter()
+        if unit_of_work:
+            async with session_maker(info={UNIT_OF_WORK: True}) as session:
+                await flow(session, chat_id, False)
+                await session.commit()
+        else:
+            async with session_maker() as session:
+                await flow(session, chat_id, True)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def run(repeat: int) -> None:
+    print(f"{'flow':<16} {'mode':<14} {'p50 ms':>8} {'p99 ms':>8} {'sql/flow':>9}")
+    for unit_of_work in (False, True):
+        fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+        engine = get_engine(db_path)
+        statements = 0
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count(*args) -> None:
+            nonlocal statements
+            statements += 1
+
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+            session_maker = async_sessionmaker(engine, expire_on_commit=False)
+            mode = "unit of work" if unit_of_work else "commit+refresh"
+            for name, flow in (
+                ("register", register),
+                ("add connection", add_connection),
+            ):
+                statements = 0
+                timings = sorted(
+                    await run_flow(
+                        session_maker, flow, range(1, repeat + 1), unit_of_work
+                    )
+                )
+                print(
+                    f"{name:<16} {mode:<14} {statistics.median(timings):>8.3f} "
+                    f"{timings[int(len(timings) * 0.99)]:>8.3f} "
+                    f"{statements / repeat:>9.1f}"
+                )
+        finally:
+            await engine.dispose()
+            for suffix in ("", "-wal", "-shm", "-journal"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    asyncio.run(run(parser.parse_args().repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+"""
+Локальная заглушка панели 3x-ui для бенчмарков.
+
+Реализует только те эндпоинты, которые использует APIClient, и считает
+запросы, логины и TCP-соединения, чтобы сравнивать варианты клиента.
+"""
+
+import asyncio
+import json
+import random
+import string
+import time
+from collections import Counter
+from typing import Any
+from uuid import uuid4
+
+from aiohttp import web
+
+
+COOKIE_NAME = "3x-ui"
+
+
+def make_client(email: str, expiry_time: int = 0) -> dict[str, Any]:
+    return {
+        "id": str(uuid4()),
+        "flow": "xtls-rprx-vision",
+        "email": email,
+        "limitIp": 3,
+        "totalGB": 0,
+        "expiryTime": expiry_time,
+        "enable": True,
+        "tgId": random.randint(1, 10**9),
+        "subId": "".join(random.choices(string.ascii_lowercase + string.digits, k=18)),
+        "comment": "",
+        "reset": 0,
+    }
+
+
+def make_stats(client: dict[str, Any], inbound_id: int, row_id: int) -> dict[str, Any]:
+    return {
+        "id": row_id,
+        "inboundId": inbound_id,
+        "enable": client["enable"],
+        "email": client["email"],
+        "up": random.randint(0, 10**10),
+        "down": random.randint(0, 10**11),
+        "expiryTime": client["expiryTime"],
+        "total": 0,
+        "reset": 0,
+    }
+
+
+class FakeInbound:
+    def __init__(self, inbound_id: int, n_clients: int = 0) -> None:
+        self.id = inbound_id
+        self.clients: list[dict[str, Any]] = []
+        self.stats: list[dict[str, Any]] = []
+        self._next_stats_id = 1
+        for i in range(n_clients):
+            self.add(make_client(f"user{inbound_id}-{i:06d}"))
+
+    def add(self, client: dict[str, Any]) -> None:
+        self.clients.append(client)
+        self.stats.append(make_stats(client, self.id, self._next_stats_id))
+        self._next_stats_id += 1
+
+    def remove(self, uuid: str) -> bool:
+        for i, client in enumerate(self.clients):
+            if client["id"] == uuid:
+                del self.clients[i]
+                self.stats = [s for s in self.stats if s["email"] != client["email"]]
+                return True
+        return False
+
+    def as_panel_dict(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "up": 0,
+            "down": 0,
+            "total": 0,
+            "remark": f"bench{self.id}",
+            "enable": True,
+            "expiryTime": 0,
+            "clientStats": self.stats,
+            "listen": "",
+            "port": 443,
+            "protocol": "vless",
+            "tag": f"inbound-{self.id}",
+            "settings": json.dumps(
+                {"clients": self.clients, "decryption": "none", "fallbacks": []}
+            ),
+            "streamSettings": json.dumps(
+                {
+                    "network": "tcp",
+                    "security": "reality",
+                    "externalProxy": [],
+                    "realitySettings": {
+                        "show": False,
+                        "xver": 0,
+                        "dest": "example.com:443",
+                        "serverNames": ["example.com"],
+                        "privateKey": "private",
+                        "minClient": "",
+                        "maxClient": "",
+                        "maxTimediff": 0,
+                        "shortIds": ["abcd"],
+                        "settings": {
+                            "publicKey": "public",
+                            "fingerprint": "chrome",
+                            "serverName": "",
+                            "spiderX": "/",
+                        },
+                    },
+                    "tcpSettings": {
+                        "acceptProxyProtocol": False,
+                        "header": {"type": "none"},
+                    },
+                }
+            ),
+            "sniffing": json.dumps(
+                {
+                    "enabled": True,
+                    "destOverride": ["http", "tls"],
+                    "metadataOnly": False,
+                    "routeOnly": False,
+                }
+            ),
+            "allocate": json.dumps(
+                {"strategy": "always", "refresh": 5, "concurrency": 3}
+            ),
+        }
+
+
+class FakePanel:
+    """
+    HTTP-сервер, имитирующий панель.
+
+    Args:
+        inbounds: Словарь inbound_id -> количество клиентов
+        latency: Искусственная задержка ответа в секундах
+    """
+
+    def __init__(self, inbounds: dict[int, int], latency: float = 0.0) -> None:
+        self.inbounds = {i: FakeInbound(i, n) for i, n in inbounds.items()}
+        self.latency = latency
+        self.requests: Counter[str] = Counter()
+        self.connections: set[tuple] = set()
+        self._list_body: bytes | None = None
+        self._runner: web.AppRunner | None = None
+        self.base_url = ""
+
+    def reset_counters(self) -> None:
+        self.requests.clear()
+        self.connections.clear()
+
+    @property
+    def list_body(self) -> bytes:
+        if self._list_body is None:
+            self._list_body = json.dumps(
+                {
+                    "success": True,
+                    "msg": "",
+                    "obj": [i.as_panel_dict() for i in self.inbounds.values()],
+                }
+            ).encode()
+        return self._list_body
+
+    def _track(self, request: web.Request, name: str) -> None:
+        self.requests[name] += 1
+        if request.transport is not None:
+            self.connections.add(request.transport.get_extra_info("peername"))
+
+    async def _delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def _authorized(self, request: web.Request) -> bool:
+        return request.cookies.get(COOKIE_NAME) == "ok"
+
+    async def login(self, request: web.Request) -> web.Response:
+        self._track(request, "login")
+        await self._delay()
+        response = web.json_response({"success": True, "msg": "", "obj": None})
+        response.set_cookie(COOKIE_NAME, "ok")
+        return response
+
+    async def inbound_list(self, request: web.Request) -> web.Response:
+        self._track(request, "list")
+        if not self._authorized(request):
+            return web.Response(status=401)
+        await self._delay()
+        return web.Response(body=self.list_body, content_type="application/json")
+
+    async def add_client(self, request: web.Request) -> web.Response:
+        self._track(request, "addClient")
+        if not self._authorized(request):
+            return web.Response(status=401)
+        await self._delay()
+        form = await request.post()
+        inbound = self.inbounds[int(str(form["id"]))]
+        for client in json.loads(str(form["settings"]))["clients"]:
+            # Панель хранит tgId как int64, null превращается в 0.
+            client["tgId"] = client.get("tgId") or 0
+            inbound.add(client)
+        self._list_body = None
+        return web.json_response({"success": True, "msg": "", "obj": None})
+
+    async def del_client(self, request: web.Request) -> web.Response:
+        self._track(request, "delClient")
+        if not self._authorized(request):
+            return web.Response(status=401)
+        await self._delay()
+        inbound = self.inbounds[int(request.match_info["inbound_id"])]
+        success = inbound.remove(request.match_info["uuid"])
+        self._list_body = None
+        return web.json_response({"success": success, "msg": "", "obj": None})
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/login", self.login)
+        app.router.add_get("/panel/api/inbounds/list", self.inbound_list)
+        app.router.add_post("/panel/inbound/addClient", self.add_client)
+        app.router.add_post(
+            "/panel/inbound/{inbound_id}/delClient/{uuid}", self.del_client
+        )
+        return app
+
+    async def __aenter__(self) -> "FakePanel":
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://localhost:{port}/"
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+class Timer:
+    def __enter__(self) -> "Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.elapsed = time.perf_counter() - self.start
@@ -0,0 +1,116 @@
+"""
+Микробенчмарк разбора ответа inbounds/list.
+
+Сравнивает полную валидацию pydantic (json.loads + Response.model_validate,
+как раньше), ленивый разбор (from_json + parse_inbound_list) и потоковый
+разбор по чанкам (InboundStreamParser) на синтетическом inbound. Для каждого
+режима: время разбора, время поиска одного клиента и пиковая память по
+tracemalloc, включая буфер с телом ответа.
+
+Запуск: python -m benchmarks.inbound_parse [--clients 50000] [--other-inbounds 0]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from app.inbound_stream import STREAM_CHUNK_SIZE, InboundStreamParser
+from app.schemas import SInbound, json_loads, parse_inbound_lazy, parse_inbound_list
+from benchmarks.fake_panel import FakeInbound
+
+INBOUND_ID = 1
+
+
+def make_body(clients: int, other_inbounds: int) -> bytes:
+    inbounds = [FakeInbound(i, clients) for i in range(1, other_inbounds + 2)]
+    return json.dumps(
+        {"success": True, "msg": "", "obj": [i.as_panel_dict() for i in inbounds]}
+    ).encode()
+
+
+def _target(inbounds: list[SInbound]) -> SInbound:
+    return next(i for i in inbounds if i.id == INBOUND_ID)
+
+
+def _validated(body: bytes) -> SInbound:
+    # bytearray: буфер, который держит response.json() до конца разбора.
+    return _target(parse_inbound_list(json.loads(bytearray(body)), validate=True))
+
+
+def _lazy(body: bytes) -> SInbound:
+    return _target(parse_inbound_list(json_loads(bytearray(body))))
+
+
+def _stream(body: bytes) -> SInbound:
+    parser = InboundStreamParser({INBOUND_ID})
+    view = memoryview(body)
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        for raw in parser.feed(view[start : start + STREAM_CHUNK_SIZE]):
+            return parse_inbound_lazy(json_loads(raw))
+    raise LookupError("inbound not found")
+
+
+MODES: dict[str, Callable[[bytes], SInbound]] = {
+    "validated": _validated,
+    "lazy": _lazy,
+    "stream": _stream,
+}
+
+
+def measure(
+    parse: Callable[[bytes], SInbound], body: bytes, email: str, repeat: int
+) -> dict[str, Any]:
+    best_parse = best_lookup = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        inbound = parse(body)
+        parsed = time.perf_counter()
+        client = inbound.get_client(email=email)
+        done = time.perf_counter()
+        assert client is not None
+        best_parse = min(best_parse, parsed - start)
+        best_lookup = min(best_lookup, done - parsed)
+        del inbound, client
+
+    gc.collect()
+    tracemalloc.start()
+    inbound = parse(body)
+    inbound.get_client(email=email)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"parse": best_parse, "lookup": best_lookup, "peak": peak}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=50_000)
+    parser.add_argument(
+        "--other-inbounds",
+        type=int,
+        default=0,
+        help="сколько ещё inbound такого же размера в ответе",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    body = make_body(args.clients, args.other_inbounds)
+    email = f"user{INBOUND_ID}-{args.clients // 2:06d}"
+    print(
+        f"payload: {len(body) / 1024 / 1024:.1f} MB, "
+        f"inbounds: {args.other_inbounds + 1}, clients per inbound: {args.clients}"
+    )
+    print(f"{'mode':<12}{'parse ms':>10}{'lookup ms':>11}{'peak MB':>10}")
+    for name, parse in MODES.items():
+        row = measure(parse, body, email, args.repeat)
+        print(
+            f"{name:<12}{row['parse'] * 1000:>10.1f}{row['lookup'] * 1000:>11.2f}"
+            f"{row['peak'] / 1024 / 1024:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Задержка хендлеров с логированием и без него.
+
+--updates имитаций хендлера выполняются по --concurrency одновременно;
+каждый пишет --lines строк INFO и отдаёт управление циклу. Логи идут в
+поток, каждая запись в который блокирует поток на --write-latency (так
+ведёт себя stdout, когда docker logs или пайп не успевают читать).
+
+Режимы:
+
+- off: уровень root WARNING, записи INFO отсекаются до создания;
+- sync: StreamHandler на root, запись и форматирование в цикле событий
+  (как было до QueueHandler);
+- queue: setup_logging() из app.dependencies.logging_settings — записи
+  уходят в очередь, пишет поток QueueListener.
+
+Печатаются p50/p99 задержки хендлера, общее время и время дозаписи
+очереди после последнего хендлера. Отдельно — цена InternalLogFilter на
+запись aiogram из venv: проверка подстрок на каждую запись против решения
+из кэша.
+
+Запуск: python -m benchmarks.logging_overhead [--updates 2000] [--write-latency 0.0002]
+"""
+
+import argparse
+import asyncio
+import atexit
+import logging
+import logging.handlers
+import statistics
+import time
+import timeit
+from typing import Any
+
+from app.dependencies.log_filters import InternalLogFilter
+from app.dependencies.logging_settings import logging_config, setup_logging
+
+logger = logging.getLogger("app.handlers.bench")
+
+# Запись aiogram из виртуального окружения, как в контейнере.
+LIBRARY_PATH = (
+    "/app/.venv/lib/python3.12/site-packages/aiogram/dispatcher/dispatcher.py"
+)
+
+
+class SlowStream:
+    def __init__(self, write_latency: float) -> None:
+        self.write_latency = write_latency
+        self.lines = 0
+
+    def write(self, text: str) -> None:
+        time.sleep(self.write_latency)
+        self.lines += text.count("\n")
+
+    def flush(self) -> None:
+        pass
+
+
+class SubstringFilter(logging.Filter):
+    """
+    InternalLogFilter без кэша: проверка подстрок на каждую запись.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return (
+            "venv" not in record.pathname
+            and "share" not in record.pathname
+            or "aiogram" in record.pathname
+        )
+
+
+def make_config(mode: str, stream: SlowStream) -> dict[str, Any]:
+    handlers = dict(logging_config["handlers"])
+    handlers["default"] = {**handlers["default"], "stream": stream}
+    root: dict[str, Any] = {"level": "INFO", "handlers": ["queue"]}
+    if mode == "off":
+        root["level"] = "WARNING"
+    elif mode == "sync":
+        handlers["default"]["filters"] = ["internal_filter"]
+        root["handlers"] = ["default"]
+        del handlers["queue"]
+    return {**logging_config, "handlers": handlers, "root": root}
+
+
+async def handle(update_id: int, lines: int) -> float:
+    started = time.perf_counter()
+    for line in range(lines):
+        logger.info("Update %s: step %s for user %s", update_id, line, update_id % 97)
+        await asyncio.sleep(0)
+    return (time.perf_counter() - started) * 1000
+
+
+async def run_mode(args: argparse.Namespace) -> list[float]:
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(update_id: int) -> float:
+        async with semaphore:
+            return await handle(update_id, args.lines)
+
+    return list(await asyncio.gather(*(limited(i) for i in range(args.updates))))
+
+
+def filter_cost(count: int) -> tuple[float, float]:
+    record = logging.LogRecord(
+        "aiogram.dispatcher", logging.INFO, LIBRARY_PATH, 1, "bench", None, None
+    )
+
+    uncached = SubstringFilter().filter
+    cached = InternalLogFilter().filter
+    return (
+        timeit.timeit(lambda: uncached(record), number=count) / count * 1e9,
+        timeit.timeit(lambda: cached(record), number=count) / count * 1e9,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--lines", type=int, default=3)
+    parser.add_argument("--write-latency", type=float, default=0.0002)
+    args = parser.parse_args()
+
+    print(
+        f"{args.updates} handlers x {args.lines} lines, concurrency "
+        f"{args.concurrency}, write latency {args.write_latency * 1000:.1f}ms"
+    )
+    for mode in ("off", "sync", "queue"):
+        stream = SlowStream(args.write_latency)
+        setup_logging(make_config(mode, stream))
+        started = time.perf_counter()
+        latencies = sorted(asyncio.run(run_mode(args)))
+        elapsed = time.perf_counter() - started
+        handler = logging.getHandlerByName("queue")
+        listener = getattr(handler, "listener", None)
+        if listener is not None:
+            listener.stop()
+            atexit.unregister(listener.stop)
+        drained = time.perf_counter() - started - elapsed
+        print(
+            f"{mode:<6} p50={statistics.median(latencies):>7.2f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99)]:>7.2f}ms "
+            f"total={elapsed:>6.2f}s drain={drained:>5.2f}s lines={stream.lines}"
+        )
+
+    uncached, cached = filter_cost(200_000)
+    print(f"filter per record: uncached={uncached:.0f}ns cached={cached:.0f}ns")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Обработка апдейтов при медленной панели: пропускная способность, задержки
+и порядок апдейтов внутри чата.
+
+Заглушка Bot API из benchmarks.webhook_load отдаёт через getUpdates пачку
+кликов: --chats чатов по --clicks апдейтов подряд. Хендлер имитирует вызов
+панели (--latency с разбросом ±50%) и записывает, в каком порядке
+обработаны апдейты каждого чата.
+
+Режимы:
+
+- sequential: handle_as_tasks=False, апдейты по одному;
+- unbounded: поведение aiogram по умолчанию, задача на каждый апдейт без
+  ограничений и без порядка внутри чата;
+- ordered: ChatOrderingMiddleware (--workers) и tasks_concurrency_limit
+  (--queue-limit), как в app.__main__.
+
+Печатаются апдейты в секунду, p50/p99 задержки от появления апдейта до
+конца хендлера, число нарушений порядка и пик принятых апдейтов.
+
+Запуск: python -m benchmarks.update_concurrency [--chats 20] [--clicks 3] [--latency 0.5]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import TelegramObject
+from aiohttp import web
+
+from app.middlewares.ordering import ChatOrderingMiddleware
+from benchmarks.webhook_load import TOKEN, FakeBotAPI, make_update
+
+
+class Result:
+    def __init__(self) -> None:
+        self.latencies: list[float] = []
+        self.order: dict[int, list[int]] = defaultdict(list)
+        self.admitted = 0
+        self.max_admitted = 0
+
+    @property
+    def violations(self) -> int:
+        return sum(
+            sum(1 for a, b in zip(ids, ids[1:]) if b < a) for ids in self.order.values()
+        )
+
+
+def make_dispatcher(
+    args: argparse.Namespace, arrived: dict[int, float], result: Result, ordered: bool
+) -> Dispatcher:
+    router = Router()
+    rng = random.Random(0)
+
+    @router.message()
+    async def handle(message: types.Message) -> None:
+        await asyncio.sleep(args.latency * rng.uniform(0.5, 1.5))
+        result.order[message.chat.id].append(message.message_id)
+        result.latencies.append(
+            (time.perf_counter() - arrived[message.message_id]) * 1000
+        )
+
+    async def count_admitted(
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: dict[str, Any],
+    ) -> Any:
+        result.admitted += 1
+        result.max_admitted = max(result.max_admitted, result.admitted)
+        try:
+            return await handler(event, data)
+        finally:
+            result.admitted -= 1
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(count_admitted)
+    if ordered:
+        dp.update.outer_middleware(ChatOrderingMiddleware(workers=args.workers))
+    dp.include_router(router)
+    return dp
+
+
+async def run_mode(args: argparse.Namespace, mode: str) -> tuple[Result, float]:
+    api = FakeBotAPI(rtt=0)
+    runner = web.AppRunner(api.app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    bot = Bot(
+        TOKEN,
+        session=AiohttpSession(
+            api=TelegramAPIServer.from_base(
+                f"http://127.0.0.1:{runner.addresses[0][1]}"
+            )
+        ),
+    )
+    arrived: dict[int, float] = {}
+    result = Result()
+    dp = make_dispatcher(args, arrived, result, ordered=mode == "ordered")
+    polling_kwargs: dict[str, Any] = {"handle_signals": False}
+    if mode == "sequential":
+        polling_kwargs["handle_as_tasks"] = False
+    elif mode == "ordered":
+        polling_kwargs["tasks_concurrency_limit"] = args.queue_limit
+    polling = asyncio.create_task(dp.start_polling(bot, **polling_kwargs))
+
+    total = args.chats * args.clicks
+    started = time.perf_counter()
+    update_id = 0
+    for _ in range(args.clicks):
+        for chat in range(args.chats):
+            update_id += 1
+            update = make_update(update_id)
+            update["message"]["chat"]["id"] = update["message"]["from"]["id"] = (
+                1000 + chat
+            )
+            arrived[update_id] = time.perf_counter()
+            api.push(update)
+    while len(result.latencies) < total:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+    await dp.stop_polling()
+    await polling
+    await runner.cleanup()
+    return result, elapsed
+
+
+async def run(args: argparse.Namespace) -> None:
+    total = args.chats * args.clicks
+    print(
+        f"{total} updates ({args.chats} chats x {args.clicks} clicks), "
+        f"panel latency {args.latency * 1000:.0f}ms, workers={args.workers}, "
+        f"queue limit={args.queue_limit}"
+    )
+    for mode in ("sequential", "unbounded", "ordered"):
+        if mode == "sequential" and args.skip_sequential:
+            continue
+        result, elapsed = await run_mode(args, mode)
+        latencies = sorted(result.latencies)
+        print(
+            f"{mode:<11} {total / elapsed:>7.1f} upd/s  "
+            f"p50={statistics.median(latencies):>7.0f}ms  "
+            f"p99={latencies[int(len(latencies) * 0.99)]:>7.0f}ms  "
+            f"out-of-order={result.violations:<4} max admitted={result.max_admitted}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chats", type=int, default=20)
+    parser.add_argument("--clicks", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--queue-limit", type=int, default=100)
+    parser.add_argument("--skip-sequential", action="store_true")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+"""
+Нагрузочный тест приёма апдейтов: webhook против long polling.
+
+Локальная заглушка Bot API генерирует синтетические апдейты с фиксированной
+частотой. В режиме polling диспетчер забирает их через getUpdates у заглушки,
+в режиме webhook заглушка сама отправляет POST на aiohttp-сервер с
+SimpleRequestHandler, как это делает app.__main__ при BOT_MODE=webhook.
+Сетевую задержку до Telegram задаёт --rtt: запрос и ответ в каждую сторону
+идут rtt/2.
+
+Задержка считается от появления апдейта в заглушке до завершения хендлера;
+печатаются p50/p99, число обработанных апдейтов и отказов из-за неверного
+секрета (их быть не должно).
+
+Запуск: python -m benchmarks.webhook_load [--rate 200] [--count 2000] [--rtt 0.05]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any
+
+import aiohttp
+from aiogram import Bot, Dispatcher, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler
+from aiohttp import web
+
+TOKEN = "42:" + "A" * 35
+SECRET = "bench-secret"
+WEBHOOK_PATH = "/webhook"
+
+
+def make_update(update_id: int) -> dict[str, Any]:
+    chat_id = 1000 + update_id % 500
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "bench"},
+            "text": "/start",
+        },
+    }
+
+
+class FakeBotAPI:
+    """
+    Заглушка Bot API: getMe и getUpdates с long polling.
+    """
+
+    def __init__(self, rtt: float) -> None:
+        self.rtt = rtt
+        self.pending: list[dict[str, Any]] = []
+        self.arrived = asyncio.Event()
+        self.app = web.Application()
+        self.app.router.add_post("/bot{token}/{method}", self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        if method == "getme":
+            result: Any = {"id": 42, "is_bot": True, "first_name": "bench"}
+        elif method == "getupdates":
+            result = await self.get_updates(await request.post())
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    async def get_updates(self, params: Any) -> list[dict[str, Any]]:
+        # Запрос бота доходит до Telegram за rtt/2.
+        await asyncio.sleep(self.rtt / 2)
+        offset = int(params.get("offset") or 0)
+        self.pending = [u for u in self.pending if u["update_id"] >= offset]
+        if not self.pending:
+            self.arrived.clear()
+            try:
+                await asyncio.wait_for(
+                    self.arrived.wait(), float(params.get("timeout") or 0)
+                )
+            except TimeoutError:
+                pass
+        updates = self.pending[:100]
+        # И столько же идёт ответ.
+        await asyncio.sleep(self.rtt / 2)
+        return updates
+
+    def push(self, update: dict[str, Any]) -> None:
+        self.pending.append(update)
+        self.arrived.set()
+
+
+def make_dispatcher(arrived: dict[int, float], latencies: list[float]) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def handle(message: types.Message) -> None:
+        latencies.append((time.perf_counter() - arrived[message.message_id]) * 1000)
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def generate(
+    rate: float, count: int, arrived: dict[int, float], deliver: Any
+) -> None:
+    started = time.perf_counter()
+    for update_id in range(1, count + 1):
+        await asyncio.sleep(max(started + update_id / rate - time.perf_counter(), 0))
+        arrived[update_id] = time.perf_counter()
+        deliver(make_update(update_id))
+
+
+async def wait_handled(latencies: list[float], count: int, timeout: float) -> None:
+    deadline = time.perf_counter() + timeout
+    while len(latencies) < count and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+
+
+async def run_polling(args: argparse.Namespace) -> tuple[list[float], int]:
+    api = FakeBotAPI(args.rtt)
+    runner = web.AppRunner(api.app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    arrived: dict[int, float] = {}
+    latencies: list[float] = []
+    dp = make_dispatcher(arrived, latencies)
+    bot = Bot(
+        TOKEN,
+        session=AiohttpSession(
+            api=TelegramAPIServer.from_base(f"http://127.0.0.1:{port}")
+        ),
+    )
+    polling = asyncio.create_task(
+        dp.start_polling(bot, handle_signals=False, polling_timeout=10)
+    )
+    try:
+        await generate(args.rate, args.count, arrived, api.push)
+        await wait_handled(latencies, args.count, timeout=30)
+    finally:
+        await dp.stop_polling()
+        await polling
+        await runner.cleanup()
+    return latencies, 0
+
+
+async def run_webhook(args: argparse.Namespace) -> tuple[list[float], int]:
+    arrived: dict[int, float] = {}
+    latencies: list[float] = []
+    dp = make_dispatcher(arrived, latencies)
+    bot = Bot(TOKEN)
+    app = web.Application()
+    SimpleRequestHandler(dp, bot, secret_token=SECRET).register(app, path=WEBHOOK_PATH)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}{WEBHOOK_PATH}"
+
+    rejected = 0
+    posts: set[asyncio.Task] = set()
+    async with aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=args.connections)
+    ) as http:
+
+        async def post(update: dict[str, Any]) -> None:
+            nonlocal rejected
+            # Telegram отправляет апдейт, он идёт до бота rtt/2.
+            await asyncio.sleep(args.rtt / 2)
+            async with http.post(
+                url,
+                json=update,
+                headers={"X-Telegram-Bot-Api-Secret-Token": SECRET},
+            ) as response:
+                if response.status != 200:
+                    rejected += 1
+
+        def deliver(update: dict[str, Any]) -> None:
+            task = asyncio.create_task(post(update))
+            posts.add(task)
+            task.add_done_callback(posts.discard)
+
+        try:
+            await generate(args.rate, args.count, arrived, deliver)
+            await asyncio.gather(*posts)
+            await wait_handled(latencies, args.count, timeout=30)
+            async with http.post(
+                url,
+                json=make_update(0),
+                headers={"X-Telegram-Bot-Api-Secret-Token": "x"},
+            ) as response:
+                assert response.status == 401, "неверный секрет должен отклоняться"
+        finally:
+            await runner.cleanup()
+            await bot.session.close()
+    return latencies, rejected
+
+
+async def run(args: argparse.Namespace) -> None:
+    print(f"rate={args.rate}/s count={args.count} rtt={args.rtt * 1000:.0f}ms")
+    for name, mode in (("polling", run_polling), ("webhook", run_webhook)):
+        latencies, rejected = await mode(args)
+        latencies.sort()
+        if not latencies:
+            print(f"{name:<8} no updates handled")
+            continue
+        print(
+            f"{name:<8} handled={len(latencies)}/{args.count} rejected={rejected} "
+            f"p50={statistics.median(latencies):.1f}ms "
+            f"p99={latencies[int(len(latencies) * 0.99)]:.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=float, default=200.0)
+    parser.add_argument("--count", type=int, default=2000)
+    parser.add_argument(
+        "--rtt", type=float, default=0.05, help="сетевая задержка до Telegram, с"
+    )
+    parser.add_argument(
+        "--connections", type=int, default=40, help="соединений Telegram к webhook"
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()